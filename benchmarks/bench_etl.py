@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import etl  # noqa: E402
+from generate_data import generate  # noqa: E402
+
+STAGES = ['process_elements', 'list_intersection', 'sorted_list_of_dicts',
+          'value_conversion', 'dictionary_comparison', 'write_tsv']
+
+
+def run_stages(file_names, out_dir, trace_memory=False):
+    """
+    Runs the stages of the ETL one after another, like etl.py does, and returns
+    for every stage the time in seconds, the number of rows it produced and,
+    if trace_memory is set, the peak of the memory allocated during the stage
+    """
+    results = dict()
+
+    @contextlib.contextmanager
+    def stage(name):
+        record = {'rows': 0}
+        if trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield record
+        record['seconds'] = time.perf_counter() - start
+        if trace_memory:
+            record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        results[name] = record
+
+    if trace_memory:
+        tracemalloc.start()
+    list_elements = etl.ListElements(file_names)
+    with stage('process_elements') as record:
+        list_elements.process_elements()
+        record['rows'] = sum(len(element.list_of_dicts) for element in list_elements.elements)
+    with stage('list_intersection') as record:
+        res_list_intersection = list_elements.list_intersection()
+        record['rows'] = len(res_list_intersection)
+    with stage('sorted_list_of_dicts') as record:
+        sorted_list_by_value = list_elements.sorted_list_of_dicts(res_list_intersection)
+        record['rows'] = len(sorted_list_by_value)
+    with stage('value_conversion') as record:
+        convert_val = list_elements.value_conversion(sorted_list_by_value)
+        record['rows'] = len(convert_val)
+    with stage('dictionary_comparison') as record:
+        processed_list = list_elements.dictionary_comparison(convert_val)
+        record['rows'] = len(processed_list)
+    with stage('write_tsv') as record:
+        etl.Element.write_tsv(sorted_list_by_value, os.path.join(out_dir, 'result_basic.tsv'))
+        etl.Element.write_tsv(processed_list, os.path.join(out_dir, 'result_advanced.tsv'))
+        record['rows'] = len(sorted_list_by_value) + len(processed_list)
+    if trace_memory:
+        tracemalloc.stop()
+    return results
+
+
+def benchmark(file_names, repeat=3, trace_memory=True):
+    """
+    Returns the best time of every stage over several runs, its throughput in rows per second
+    and the peak memory measured in a separate run, because tracing slows the stages down
+    """
+    with tempfile.TemporaryDirectory() as out_dir:
+        runs = [run_stages(file_names, out_dir) for _ in range(repeat)]
+        memory = run_stages(file_names, out_dir, trace_memory=True) if trace_memory else None
+    results = dict()
+    for name in STAGES:
+        seconds = min(run[name]['seconds'] for run in runs)
+        rows = runs[0][name]['rows']
+        results[name] = {'seconds': seconds, 'rows': rows, 'rows_per_second': rows / seconds if seconds else 0.0}
+        if memory is not None:
+            results[name]['peak_bytes'] = memory[name]['peak_bytes']
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Returns the descriptions of the stages that are slower or use more memory than the baseline allows"""
+    regressions = list()
+    for name, record in results.items():
+        if name not in baseline:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            if metric in record and metric in baseline[name] and \
+                    record[metric] > baseline[name][metric] * (1 + tolerance):
+                regressions.append('{}: {} {:.4g} > baseline {:.4g}'.format(
+                    name, metric, record[metric], baseline[name][metric]))
+    return regressions
+
+
+def print_results(results):
+    print('{:<24}{:>12}{:>12}{:>16}{:>14}'.format('stage', 'rows', 'seconds', 'rows/second', 'peak MB'))
+    for name, record in results.items():
+        peak = record.get('peak_bytes')
+        print('{:<24}{:>12}{:>12.4f}{:>16.0f}{:>14}'.format(
+            name, record['rows'], record['seconds'], record['rows_per_second'],
+            '-' if peak is None else '{:.1f}'.format(peak / (1024 * 1024))))
+    return
+
+
+if __name__ == "__main__":
+
+    def parser_cmd():
+        """Parses command line arguments"""
+
+        parser = argparse.ArgumentParser(prog='bench_etl',
+                                         description='Measures every stage of the simple ETL on generated data.')
+        parser.add_argument('-r', '--rows', type=int, default=10000, help='number of rows in every file')
+        parser.add_argument('-d', '--d_columns', type=int, default=3, help="number of 'D' columns")
+        parser.add_argument('-m', '--m_columns', type=int, default=3, help="number of common 'M' columns")
+        parser.add_argument('-e', '--extra_m_columns', type=int, default=6,
+                            help="number of extra 'M' columns in the second '.csv' file")
+        parser.add_argument('-c', '--cardinality', type=int, default=10,
+                            help="number of distinct values in every 'D' column")
+        parser.add_argument('-b', '--bad_rate', type=float, default=0.0,
+                            help="share of 'M' values that are not numbers")
+        parser.add_argument('-n', '--repeat', type=int, default=3, help='number of timed runs, the best is kept')
+        parser.add_argument('--no-memory', action='store_true', help='do not measure the peak memory')
+        parser.add_argument('--baseline', help='JSON file with the results to compare with')
+        parser.add_argument('--save-baseline', help='save the results to this JSON file')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='allowed relative increase over the baseline')
+        args = parser.parse_args()
+        return args
+
+    args_parse = parser_cmd()
+    with tempfile.TemporaryDirectory() as data_dir:
+        bench_files = generate(data_dir, args_parse.rows, args_parse.d_columns, args_parse.m_columns,
+                               args_parse.extra_m_columns, args_parse.cardinality, args_parse.bad_rate)
+        bench_results = benchmark(bench_files, args_parse.repeat, not args_parse.no_memory)
+    print_results(bench_results)
+
+    if args_parse.save_baseline is not None:
+        with open(args_parse.save_baseline, 'w') as baseline_file:
+            json.dump(bench_results, baseline_file, indent=2)
+    if args_parse.baseline is not None:
+        with open(args_parse.baseline) as baseline_file:
+            found_regressions = compare(bench_results, json.load(baseline_file), args_parse.tolerance)
+        for regression in found_regressions:
+            print('\nRegression:  {}'.format(regression))
+        if len(found_regressions) > 0:
+            sys.exit(1)
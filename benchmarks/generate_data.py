@@ -0,0 +1,103 @@
+import os
+import csv
+import json
+import random
+import argparse
+from xml.sax.saxutils import escape, quoteattr
+
+
+def make_rows(rows, d_columns, m_columns, cardinality, bad_rate, rnd):
+    """Yields dictionaries with 'D' columns of the given cardinality and 'M' columns of integers"""
+    values = ['v{}'.format(number) for number in range(cardinality)]
+    for _ in range(rows):
+        dct = dict()
+        for number in range(1, d_columns + 1):
+            dct['D{}'.format(number)] = rnd.choice(values)
+        for number in range(1, m_columns + 1):
+            dct['M{}'.format(number)] = 'x' if rnd.random() < bad_rate else rnd.randrange(1000)
+        yield dct
+
+
+def write_csv(pathname, list_of_dicts, fieldnames):
+    with open(pathname, 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(list_of_dicts)
+    return
+
+
+def write_json(pathname, list_of_dicts):
+    """Writes the records into the 'fields' list one at a time, in the layout of the examples"""
+    with open(pathname, 'w') as json_file:
+        json_file.write('{\n  "fields": [')
+        for number, dct in enumerate(list_of_dicts):
+            json_file.write(',\n    ' if number > 0 else '\n    ')
+            json.dump(dct, json_file)
+        json_file.write('\n  ]\n}\n')
+    return
+
+
+def write_xml(pathname, list_of_dicts):
+    with open(pathname, 'w') as xml_file:
+        xml_file.write('<?xml version="1.0" encoding="UTF-8" ?>\n<root>\n')
+        for dct in list_of_dicts:
+            xml_file.write('    <objects>\n')
+            for key, value in dct.items():
+                xml_file.write('        <object name={}>\n            <value>{}</value>\n        </object>\n'
+                               .format(quoteattr(key), escape(str(value))))
+            xml_file.write('    </objects>\n')
+        xml_file.write('</root>\n')
+    return
+
+
+def generate(directory, rows=10000, d_columns=3, m_columns=3, extra_m_columns=6,
+             cardinality=10, bad_rate=0.0, seed=0):
+    """
+    Writes four files with the structure described in the README: two '.csv' files,
+    the second with extra_m_columns more 'M' columns in a shuffled order,
+    a '.json' file and a '.xml' file, each with the given number of rows.
+    Returns the list of file names
+    """
+    rnd = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    keys_d = ['D{}'.format(number) for number in range(1, d_columns + 1)]
+    keys_m = ['M{}'.format(number) for number in range(1, m_columns + 1)]
+    file_names = [os.path.join(directory, name)
+                  for name in ('csv_data_1.csv', 'csv_data_2.csv', 'json_data.json', 'xml_data.xml')]
+
+    write_csv(file_names[0], make_rows(rows, d_columns, m_columns, cardinality, bad_rate, rnd), keys_d + keys_m)
+    fieldnames = keys_d + ['M{}'.format(number) for number in range(1, m_columns + extra_m_columns + 1)]
+    rnd.shuffle(fieldnames)
+    write_csv(file_names[1], make_rows(rows, d_columns, m_columns + extra_m_columns, cardinality, bad_rate, rnd),
+              fieldnames)
+    write_json(file_names[2], make_rows(rows, d_columns, m_columns, cardinality, bad_rate, rnd))
+    write_xml(file_names[3], make_rows(rows, d_columns, m_columns, cardinality, bad_rate, rnd))
+    return file_names
+
+
+if __name__ == "__main__":
+
+    def parser_cmd():
+        """Parses command line arguments"""
+
+        parser = argparse.ArgumentParser(prog='generate_data',
+                                         description='Generates input files for the simple ETL.')
+        parser.add_argument('-o', '--out_dir', default='bench_data', help='directory for the files')
+        parser.add_argument('-r', '--rows', type=int, default=10000, help='number of rows in every file')
+        parser.add_argument('-d', '--d_columns', type=int, default=3, help="number of 'D' columns")
+        parser.add_argument('-m', '--m_columns', type=int, default=3, help="number of common 'M' columns")
+        parser.add_argument('-e', '--extra_m_columns', type=int, default=6,
+                            help="number of extra 'M' columns in the second '.csv' file")
+        parser.add_argument('-c', '--cardinality', type=int, default=10,
+                            help="number of distinct values in every 'D' column")
+        parser.add_argument('-b', '--bad_rate', type=float, default=0.0,
+                            help="share of 'M' values that are not numbers")
+        parser.add_argument('-s', '--seed', type=int, default=0, help='seed of the random generator')
+        args = parser.parse_args()
+        return args
+
+    args_parse = parser_cmd()
+    for file_name in generate(args_parse.out_dir, args_parse.rows, args_parse.d_columns, args_parse.m_columns,
+                              args_parse.extra_m_columns, args_parse.cardinality, args_parse.bad_rate,
+                              args_parse.seed):
+        print(file_name)
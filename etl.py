@@ -1,44 +1,291 @@
 import csv
 import json
+import itertools
 import argparse
+import array
+import bz2
+import collections
+import concurrent.futures
+import contextlib
+import gzip
+import hashlib
+import heapq
+import io
+import locale
+import lzma
+import marshal
+import mmap
+import multiprocessing
+import operator
+import os
+import queue
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import zlib
 from xml.etree import ElementTree
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SORT_MEMORY_LIMIT = 128 * 1024 * 1024
+CSV_CHUNK_SIZE = 32 * 1024 * 1024
+AGGREGATION_MEMORY_LIMIT = 256 * 1024 * 1024
+CACHE_SIZE_LIMIT = 1024 * 1024 * 1024
+COMPRESSION_CHUNK_SIZE = 1024 * 1024
+COMPRESSION_QUEUE_SIZE = 8
+COMPRESSION_CODECS = {'.gz': gzip, '.bz2': bz2, '.xz': lzma}
+PIPELINE_BATCH_SIZE = 10000
+PIPELINE_QUEUE_SIZE = 8
+PARTIAL_CHUNK_SIZE = 10000
+
 
 class Element:
-    def __init__(self, file_name):
+    def __init__(self, file_name, metrics=None):
         self.file_name = file_name
         self.list_of_dicts = list()
+        self.columns = None
+        self.table = None
+        self.metrics = Metrics() if metrics is None else metrics
         return
 
-    def read_csv(self):
-        with open(self.file_name, 'r') as csv_file:
-            reader_csv = csv.DictReader(csv_file)
-            result = list(reader_csv)
-            if len(result) == 0:
+    def read_csv(self, columns=None):
+        with self.metrics.stage('read_csv') as record:
+            count = len(self.list_of_dicts)
+            self.list_of_dicts.extend(self.iter_csv(columns))
+            if len(self.list_of_dicts) == count:
                 print("\nCSV file is empty")
-            self.list_of_dicts.extend(result)
+            record['rows_out'] = len(self.list_of_dicts) - count
+            record['bytes_read'] = os.path.getsize(self.file_name)
         return
 
-    def read_json(self):
-        with open(self.file_name, newline='') as json_file:
+    def read_json(self, columns=None):
+        with self.metrics.stage('read_json') as record:
+            count = len(self.list_of_dicts)
             try:
-                reader_json = json.load(json_file)
-                self.list_of_dicts.extend(reader_json['fields'])
+                self.list_of_dicts.extend(self._stream_json(columns))
             except ValueError as err:
                 print('\nError JSON:  {}'.format(err))
+                del self.list_of_dicts[count:]
+            record['rows_out'] = len(self.list_of_dicts) - count
+            record['bytes_read'] = os.path.getsize(self.file_name)
+        return
+
+    def read_xml(self, columns=None):
+        with self.metrics.stage('read_xml') as record:
+            count = len(self.list_of_dicts)
+            try:
+                self.list_of_dicts.extend(self._iterparse_xml(columns))
+            except ElementTree.ParseError as err:
+                print('\nError parsing XML:  {}'.format(err))
+                del self.list_of_dicts[count:]
+            record['rows_out'] = len(self.list_of_dicts) - count
+            record['bytes_read'] = os.path.getsize(self.file_name)
+        return
+
+    def read_etlc(self, columns=None):
+        with self.metrics.stage('read_etlc') as record:
+            count = len(self.list_of_dicts)
+            self.list_of_dicts.extend(self.iter_etlc(columns))
+            record['rows_out'] = len(self.list_of_dicts) - count
+            record['bytes_read'] = os.path.getsize(self.file_name)
+        return
+
+    def iter_csv(self, columns=None):
+        """
+        Yields the rows of the '.csv' file one at a time. If the columns are given,
+        the dictionaries are created only with these columns
+        """
+        with _open_file(self.file_name, 'r') as csv_file:
+            if columns is None:
+                yield from csv.DictReader(csv_file)
+            else:
+                reader_csv = csv.reader(csv_file)
+                header = next(reader_csv, None)
+                if header is not None:
+                    yield from _project_csv(reader_csv, header, columns)
+        return
+
+    def iter_json(self, columns=None):
+        """
+        Yields the dictionaries of the 'fields' list of the '.json' file, only with the columns
+        if they are given. A decoding error is printed and raised again: the records yielded
+        before it must be discarded by the caller, as read_json drops the whole file
+        """
+        try:
+            yield from self._stream_json(columns)
+        except ValueError as err:
+            print('\nError JSON:  {}'.format(err))
+            raise
+        return
+
+    def _stream_json(self, columns=None):
+        """Decodes the records of the 'fields' list one at a time, see _JsonFieldsStream"""
+        with _open_file(self.file_name, newline='') as json_file:
+            if columns is None:
+                yield from _JsonFieldsStream(json_file)
+            else:
+                yield from map(RowCompiler.projector(columns), _JsonFieldsStream(json_file))
         return
 
-    def read_xml(self):
+    def iter_xml(self, columns=None):
+        """
+        Yields a dictionary for every 'objects' element of the '.xml' file, only with the columns
+        if they are given. A parsing error is printed and raised again: the rows yielded
+        before it must be discarded by the caller, as read_xml drops the whole file
+        """
         try:
-            tree = ElementTree.parse(self.file_name)
-            root = tree.getroot()
-            for obs in root.findall(".//objects"):
-                dict_xml = dict()
-                for obj in obs:
-                    dict_xml[obj.attrib['name']] = obj.find('value').text
-                self.list_of_dicts.append(dict_xml)
+            yield from self._iterparse_xml(columns)
         except ElementTree.ParseError as err:
             print('\nError parsing XML:  {}'.format(err))
+            raise
+        return
+
+    def _iterparse_xml(self, columns=None):
+        """
+        Parses the '.xml' file incrementally and yields a dictionary for every 'objects'
+        element below the root as soon as the element is closed. Processed elements
+        are removed from the tree, so the memory use does not depend on the file size
+        """
+        column_set = set() if columns is None else set(columns)
+        project = None if columns is None else RowCompiler.projector(columns)
+        with _open_file(self.file_name, 'rb') as xml_file:
+            parents = list()
+            open_objects = 0
+            for event, elem in ElementTree.iterparse(xml_file, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == 'objects' and len(parents) > 0:
+                        open_objects += 1
+                    parents.append(elem)
+                    continue
+                parents.pop()
+                if elem.tag == 'objects' and len(parents) > 0:
+                    open_objects -= 1
+                    dict_xml = dict()
+                    for obj in elem:
+                        name = obj.attrib['name']
+                        if columns is None or name in column_set:
+                            dict_xml[name] = obj.find('value').text
+                    yield dict_xml if project is None else project(dict_xml)
+                if open_objects == 0 and len(parents) > 0:
+                    parents[-1].remove(elem)
+        return
+
+    def iter_etlc(self, columns=None):
+        """Yields the rows of the '.etlc' binary columnar file without parsing, see ColumnarTable.from_file"""
+        yield from ColumnarTable.from_file(self.file_name, columns).iter_rows()
+        return
+
+    def iter_rows(self, columns=None):
+        """
+        Returns an iterator over the rows of the file, the reader is chosen by the file extension.
+        If the columns are given, only they are read
+        """
+        file_type = _file_type(self.file_name)
+        if file_type == '.csv':
+            return self.iter_csv(columns)
+        elif file_type == '.json':
+            return self.iter_json(columns)
+        elif file_type == '.xml':
+            return self.iter_xml(columns)
+        elif file_type == '.etlc':
+            return self.iter_etlc(columns)
+        else:
+            raise NameError("Acceptable file types - '.csv', '.json', '.xml', '.etlc'")
+
+    def read_schema(self):
+        """
+        Returns the keys of the file without reading the data: the header of the '.csv' file,
+        the keys of the first record of the '.json' file or of the first 'objects' of the '.xml'.
+        A file without rows has no keys, like in keys_of_dicts
+        """
+        file_type = _file_type(self.file_name)
+        if file_type == '.csv':
+            with _open_file(self.file_name, 'r') as csv_file:
+                reader_csv = csv.reader(csv_file)
+                header = next(reader_csv, None)
+                if any(row != [] for row in reader_csv):
+                    return list(dict.fromkeys(header))
+                return list()
+        if file_type == '.etlc':
+            table = ColumnarTable.from_file(self.file_name)
+            return list() if table.length == 0 else table.columns
+        if file_type == '.json':
+            rows = self._stream_json()
+        elif file_type == '.xml':
+            rows = self._iterparse_xml()
+        else:
+            raise NameError("Acceptable file types - '.csv', '.json', '.xml', '.etlc'")
+        try:
+            first = next(rows, None)
+        except (ValueError, ElementTree.ParseError):
+            first = None
+        rows.close()
+        return list() if first is None else list(first.keys())
+
+    def csv_chunks(self, chunk_size=CSV_CHUNK_SIZE):
+        """
+        Splits the '.csv' file at line boundaries into parts of about chunk_size bytes,
+        so that they can be parsed independently. Returns the header and a list
+        of (start, end) byte offsets, or None if the file is small or contains quotes,
+        because a quoted value can contain a line break. Compressed files are not split
+        """
+        if _file_type(self.file_name) != os.path.splitext(self.file_name)[1]:
+            return None
+        if os.path.getsize(self.file_name) <= chunk_size:
+            return None
+        with open(self.file_name, 'rb') as csv_file, \
+                mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as csv_map:
+            if csv_map.find(b'"') != -1:
+                return None
+            start = csv_map.find(b'\n') + 1
+            if start == 0:
+                return None
+            header = next(csv.reader([csv_map[:start].decode(locale.getpreferredencoding(False))]))
+            chunks = list()
+            while start < len(csv_map):
+                end = csv_map.find(b'\n', start + chunk_size)
+                end = len(csv_map) if end == -1 else end + 1
+                chunks.append((start, end))
+                start = end
+        return header, chunks
+
+    def read_table(self, columns=None):
+        """
+        Reads the file into a ColumnarTable instead of the list of dictionaries,
+        the columns are taken from the first row if they are not given.
+        A '.etlc' file is memory-mapped instead of being read
+        """
+        with self.metrics.stage('read_table') as record:
+            if _file_type(self.file_name) == '.etlc':
+                self.table = ColumnarTable.from_file(self.file_name, columns)
+                record['rows_out'] = self.table.length
+                record['bytes_read'] = os.path.getsize(self.file_name)
+                return
+            rows = self.iter_rows(columns)
+            first = next(rows, None)
+            if columns is None:
+                columns = list() if first is None else first.keys()
+            self.table = ColumnarTable(columns)
+            if first is not None:
+                self.table.append(first)
+                self.table.extend(rows)
+            record['rows_out'] = self.table.length
+            record['bytes_read'] = os.path.getsize(self.file_name)
         return
 
     def keys_of_dicts(self):
@@ -48,37 +295,210 @@ class Element:
             return self.list_of_dicts[0].keys()
 
     @staticmethod
-    def write_tsv(list_of_dicts, pathname):
-        """Writes the list of dictionaries into the '.tsv' file"""
-        with open(pathname, 'w', newline='') as out_file:
-            tsv_writer = csv.DictWriter(out_file, delimiter='\t', fieldnames=list_of_dicts[0].keys())
-            tsv_writer.writeheader()
-            tsv_writer.writerows(list_of_dicts)
+    def write_tsv(list_of_dicts, pathname, metrics=None):
+        """
+        Writes the list of dictionaries into the '.tsv' file.
+        Any iterable of dictionaries is accepted, the rows are written as they arrive
+        """
+        metrics = Metrics() if metrics is None else metrics
+        with metrics.stage('write_tsv') as record:
+            rows = iter(list_of_dicts)
+            first = next(rows, None)
+            with _open_file(pathname, 'w', newline='') as out_file:
+                if first is not None:
+                    counter = itertools.count()
+                    tsv_writer = csv.DictWriter(out_file, delimiter='\t', fieldnames=list(first.keys()))
+                    tsv_writer.writeheader()
+                    tsv_writer.writerow(first)
+                    tsv_writer.writerows(dct for dct, _ in zip(rows, counter))
+                    record['rows_out'] = next(counter) + 1
+            record['rows_in'] = record['rows_out']
+            record['bytes_written'] = os.path.getsize(pathname)
+        return
+
+    @staticmethod
+    def write_etlc(list_of_dicts, pathname, metrics=None):
+        """
+        Writes the list of dictionaries into the '.etlc' binary columnar file, see ColumnarTable.to_file.
+        Any iterable of dictionaries with the same keys is accepted
+        """
+        metrics = Metrics() if metrics is None else metrics
+        with metrics.stage('write_etlc') as record:
+            rows = iter(list_of_dicts)
+            first = next(rows, None)
+            table = ColumnarTable(list() if first is None else first.keys())
+            if first is not None:
+                table.append(first)
+                table.extend(rows)
+            table.to_file(pathname)
+            record['rows_in'] = record['rows_out'] = table.length
+            record['bytes_written'] = os.path.getsize(pathname)
         return
 
 
 class ListElements:
-    def __init__(self, list_of_file_names):
+    def __init__(self, list_of_file_names, metrics=None):
         self.list_of_file_names = list_of_file_names
+        self.metrics = Metrics() if metrics is None else metrics
         self.elements = list()
+        self.inter_keys = None
         self._keys_with_d = list()
         self._keys_with_m = list()
         return
 
-    def process_elements(self):
+    def plan_schema(self):
+        """
+        Reads only the schema of every file (see Element.read_schema) and finds the keys
+        present in all files, before the data is read. They are saved to inter_keys and can be
+        passed to process_elements, so the readers do not create the other keys at all.
+        Returns a report for every file: its keys, the keys it lacks compared to the other
+        files and its keys that are dropped because some other file lacks them
+        """
+        with self.metrics.stage('plan_schema'):
+            schemas = [Element(file_name).read_schema() for file_name in self.list_of_file_names]
+        inter_keys = set(schemas[0]) if len(schemas) > 0 else set()
+        all_keys = set()
+        for schema in schemas:
+            inter_keys &= set(schema)
+            all_keys |= set(schema)
+        self.inter_keys = sorted(inter_keys)
+        report = dict()
+        for file_name, schema in zip(self.list_of_file_names, schemas):
+            report[file_name] = {'keys': schema,
+                                 'missing': sorted(all_keys - set(schema)),
+                                 'dropped': sorted(set(schema) - inter_keys)}
+        return report
+
+    @staticmethod
+    def print_schema_report(report, mismatches_only=False):
+        """
+        Prints the report of plan_schema. If mismatches_only is set, only the files
+        with missing or dropped keys are printed
+        """
+        for file_name, schema in report.items():
+            if mismatches_only and len(schema['missing']) == 0 and len(schema['dropped']) == 0:
+                continue
+            print('\n{}:  keys {}'.format(file_name, ', '.join(schema['keys']) or '-'))
+            if len(schema['missing']) > 0:
+                print('  missing keys:  {}'.format(', '.join(schema['missing'])))
+            if len(schema['dropped']) > 0:
+                print('  dropped keys:  {}'.format(', '.join(schema['dropped'])))
+        return
+
+    def process_elements(self, workers=1, chunk_size=CSV_CHUNK_SIZE, columns=None, cache=None, executor=None):
+        """
+        Reads all files. With more than one worker the files are parsed in a process pool,
+        large '.csv' files are also split into chunks which are parsed in parallel.
+        The rows are collected in the order of the files, so the result does not
+        depend on the number of workers.
+        If the columns are given (for example inter_keys found by plan_schema),
+        only these columns are read.
+        If a ParseCache is given, unchanged files are loaded from it and only new
+        or modified files are parsed and then saved to it.
+        A running process pool can be given as the executor, then it is used instead of a new one
+        """
+        with self.metrics.stage('process_elements') as record:
+            if workers > 1:
+                self._process_elements_parallel(workers, chunk_size, columns, cache, executor)
+            else:
+                self._process_elements_serial(columns, cache)
+            record['rows_out'] = sum(len(element.list_of_dicts) for element in self.elements)
+            record['bytes_read'] = sum(os.path.getsize(element.file_name) for element in self.elements)
+        return
+
+    def _process_elements_serial(self, columns, cache):
+        for file_name in self.list_of_file_names:
+            element = Element(file_name, self.metrics)
+            element.columns = columns
+            self.elements.append(element)
+            file_type = _file_type(file_name)
+            if file_type in ('.csv', '.json', '.xml') and cache is not None:
+                rows = cache.load(file_name, columns)
+                if rows is not None:
+                    element.list_of_dicts = rows
+                    continue
+            if file_type == '.csv':
+                element.read_csv(columns)
+            elif file_type == '.json':
+                element.read_json(columns)
+            elif file_type == '.xml':
+                element.read_xml(columns)
+            elif file_type == '.etlc':
+                element.read_etlc(columns)
+                continue
+            else:
+                raise NameError("Acceptable file types - '.csv', '.json', '.xml', '.etlc'")
+            if cache is not None:
+                cache.store(file_name, element.list_of_dicts, columns)
+        return
+
+    def _process_elements_parallel(self, workers, chunk_size, columns, cache, executor=None):
+        if executor is None:
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                self._process_elements_parallel(workers, chunk_size, columns, cache, executor)
+            return
+        futures = list()
         for file_name in self.list_of_file_names:
-            element = Element(file_name)
+            element = Element(file_name, self.metrics)
+            element.columns = columns
             self.elements.append(element)
-            if file_name.endswith('.csv'):
-                element.read_csv()
-            elif file_name.endswith('.json'):
-                element.read_json()
-            elif file_name.endswith('.xml'):
-                element.read_xml()
+            file_type = _file_type(file_name)
+            if file_type not in ('.csv', '.json', '.xml', '.etlc'):
+                raise NameError("Acceptable file types - '.csv', '.json', '.xml', '.etlc'")
+            if file_type == '.etlc':
+                element.read_etlc(columns)
+                futures.append(None)
+                continue
+            rows = None if cache is None else cache.load(file_name, columns)
+            if rows is not None:
+                element.list_of_dicts = rows
+                futures.append(None)
+                continue
+            chunks = element.csv_chunks(chunk_size) if file_type == '.csv' else None
+            if chunks is None:
+                futures.append([executor.submit(_read_file, file_name, columns)])
             else:
-                raise NameError("Acceptable file types - '.csv', '.json', '.xml'")
+                header, offsets = chunks
+                futures.append([executor.submit(_read_csv_chunk, file_name, header, start, end, columns)
+                                for start, end in offsets])
+        for element, element_futures in zip(self.elements, futures):
+            if element_futures is None:
+                continue
+            for future in element_futures:
+                element.list_of_dicts.extend(future.result())
+            if len(element_futures) > 1 and len(element.list_of_dicts) == 0:
+                print("\nCSV file is empty")
+            if cache is not None:
+                cache.store(element.file_name, element.list_of_dicts, element.columns)
+        return
+
+    def process_tables(self, columns=None):
+        """Reads all files (only the columns, if they are given) into columnar tables, see ColumnarTable"""
+        with self.metrics.stage('process_tables') as record:
+            for file_name in self.list_of_file_names:
+                element = Element(file_name, self.metrics)
+                element.columns = columns
+                self.elements.append(element)
+                element.read_table(columns)
+            record['rows_out'] = sum(element.table.length for element in self.elements)
+            record['bytes_read'] = sum(os.path.getsize(element.file_name) for element in self.elements)
         return
 
+    def table_intersection(self):
+        """
+        Columnar version of list_intersection: the tables of all files are projected
+        onto the common columns and joined into one table with alphabetically sorted columns
+        """
+        inter_keys = set(self.elements[0].table.columns)
+        for element in self.elements:
+            inter_keys &= set(element.table.columns)
+        inter_keys = sorted(inter_keys)
+        with self.metrics.stage('table_intersection') as record:
+            tables = [element.table.project(inter_keys) for element in self.elements]
+            table = ColumnarTable.concatenate(tables, inter_keys)
+            record['rows_in'] = record['rows_out'] = table.length
+        return table
+
     def list_intersection(self):
         """
         Looking for intersection of keys that are present in all
@@ -89,26 +509,93 @@ class ListElements:
         for element in self.elements:
             inter_keys &= element.keys_of_dicts()
         res_list_of_dicts = list()
-        for element in self.elements:
-            res_list_of_dicts.extend([{key: dct[key] for key in inter_keys} for dct in element.list_of_dicts])
+        with self.metrics.stage('list_intersection') as record:
+            for element in self.elements:
+                if element.columns is not None and set(element.columns) == set(inter_keys):
+                    res_list_of_dicts.extend(element.list_of_dicts)
+                else:
+                    res_list_of_dicts.extend(map(RowCompiler.projector(inter_keys), element.list_of_dicts))
+            record['rows_in'] = sum(len(element.list_of_dicts) for element in self.elements)
+            record['rows_out'] = len(res_list_of_dicts)
         return res_list_of_dicts
 
+    def intersection_keys(self):
+        """
+        Returns the alphabetically sorted keys that are present in all files,
+        found by plan_schema if it has not been called yet
+        """
+        if self.inter_keys is None:
+            self.plan_schema()
+        return self.inter_keys
+
+    @staticmethod
+    def iter_projected(file_name, inter_keys):
+        """Yields the rows of one file, only the specified keys are read"""
+        return Element(file_name).iter_rows(inter_keys)
+
+    def iter_intersection(self):
+        """
+        Streaming version of list_intersection. The files are read lazily,
+        the keys of the yielded dictionaries are in alphabetical order
+        """
+        inter_keys = self.intersection_keys()
+        for file_name in self.list_of_file_names:
+            yield from self.iter_projected(file_name, inter_keys)
+        return
+
+    def iter_external_sorted(self, sorting_key='', memory_limit=SORT_MEMORY_LIMIT):
+        """
+        Yields the intersected rows of all files sorted like sorted_list_of_dicts,
+        using no more than about memory_limit bytes for the rows.
+        Every file is read once, rows that come already sorted are not sorted again, see ExternalSorter
+        """
+        inter_keys = self.intersection_keys()
+        if len(inter_keys) == 0:
+            return
+        sorter = ExternalSorter(inter_keys, sorting_key, memory_limit)
+        for file_name in self.list_of_file_names:
+            sorter.extend(self.iter_projected(file_name, inter_keys))
+        yield from sorter
+        return
+
+    @staticmethod
+    def sorting_column(keys_of_dict, sorting_key=''):
+        """Returns the key to sort by: the specified key or the first key in alphabetical order"""
+        if sorting_key == '' or sorting_key not in keys_of_dict:
+            return sorted(keys_of_dict)[0]
+        return sorting_key
+
     @staticmethod
     def sorted_list_of_dicts(res_list_of_dicts, sorting_key=''):
         """Sorts by dictionary key, and then by the values of the specified key"""
-        keys_of_dict = res_list_of_dicts[0].keys()
-        if sorting_key == '' or sorting_key not in keys_of_dict:
-            sorting_key = sorted(keys_of_dict)[0]
-            key_sorted_dicts = [{k: dct[k] for k in sorted(dct)} for dct in res_list_of_dicts]
-        else:
-            key_sorted_dicts = [{k: dct[k] for k in sorted(dct)} for dct in res_list_of_dicts]
+        sorting_key = ListElements.sorting_column(res_list_of_dicts[0].keys(), sorting_key)
+        key_sorted_dicts = list(map(RowCompiler.key_sorter(res_list_of_dicts[0].keys()), res_list_of_dicts))
         return sorted(key_sorted_dicts, key=lambda i: i[sorting_key])
 
+    @staticmethod
+    def iter_sorted(list_of_dicts, sorting_key='', memory_limit=SORT_MEMORY_LIMIT):
+        """
+        Streaming counterpart of sorted_list_of_dicts, accepts any iterable of dictionaries
+        with the same keys. The rows are sorted with ExternalSorter, so when they take more
+        than memory_limit bytes, they are spilled to temporary files
+        """
+        rows = iter(list_of_dicts)
+        first = next(rows, None)
+        if first is None:
+            return
+        sorter = ExternalSorter(first.keys(), sorting_key, memory_limit)
+        sorter.add(first)
+        sorter.extend(rows)
+        yield from sorter
+        return
+
     def key_separation(self, list_of_keys):
         """
         Divides the list of keys into two, a list in which the key names begin with a 'D'
         and a list where the key names begin with an 'M'
         """
+        self._keys_with_d = list()
+        self._keys_with_m = list()
         for key in list_of_keys:
             if key.startswith('D'):
                 self._keys_with_d.append(key)
@@ -118,78 +605,2015 @@ class ListElements:
 
     def value_conversion(self, list_of_dicts):
         """Conversion of values by specified keys to 'int' type"""
-        self.key_separation(list_of_dicts[0].keys())
-        converted_list = list()
-        for dct in list_of_dicts:
-            new_dct = dict()
-            for key, value in dct.items():
-                if key in self._keys_with_m:
-                    try:
-                        value = int(value)
-                    except ValueError as err:
-                        print('\nError in string conversion:  {}'.format(err))
-                        value = 0
-                new_dct[key] = value
-            converted_list.append(new_dct)
+        with self.metrics.stage('value_conversion', len(list_of_dicts)) as record:
+            errors = self.metrics.conversion_errors
+            converted_list = list(self.iter_value_conversion(list_of_dicts))
+            record['rows_out'] = len(converted_list)
+            record['conversion_errors'] = self.metrics.conversion_errors - errors
         return converted_list
 
+    def iter_value_conversion(self, list_of_dicts):
+        """
+        Streaming version of value_conversion, the dictionaries are converted one at a time.
+        Values that can not be converted are replaced by 0 and counted,
+        the number of them is printed at the end
+        """
+        rows = iter(list_of_dicts)
+        first = next(rows, None)
+        if first is None:
+            return
+        self.key_separation(first.keys())
+        self._first_conversion_error = None
+        errors = self.metrics.conversion_errors
+        convert = RowCompiler.converter(first.keys(), self._keys_with_m, self._conversion_error, self._convert_row)
+        yield from map(convert, itertools.chain([first], rows))
+        self._print_conversion_errors(self.metrics.conversion_errors - errors)
+        return
+
+    def _convert_row(self, dct):
+        new_dct = dict()
+        for key, value in dct.items():
+            if key in self._keys_with_m:
+                try:
+                    value = int(value)
+                except ValueError as err:
+                    value = self._conversion_error(err)
+            new_dct[key] = value
+        return new_dct
+
+    def _conversion_error(self, err):
+        """Counts a value that can not be converted, returns 0 which replaces it"""
+        self.metrics.conversion_errors += 1
+        if self._first_conversion_error is None:
+            self._first_conversion_error = err
+        return 0
+
+    def _print_conversion_errors(self, errors):
+        if errors > 0:
+            print('\nError in string conversion:  {} values replaced by 0, the first error: {}'.format(
+                errors, self._first_conversion_error))
+        return
+
+    def process_fused(self, sorting_key='', sort_memory=SORT_MEMORY_LIMIT, group_memory=AGGREGATION_MEMORY_LIMIT):
+        """
+        Reads every row of all files exactly once: the intersected row is added to an ExternalSorter
+        for the basic result, and the row with converted values is added to a HashAggregator
+        for the advanced result at the same time, without intermediate lists.
+        Returns the sorter and the aggregator, iterating them yields the two results
+        """
+        inter_keys = self.intersection_keys()
+        if len(inter_keys) == 0:
+            return list(), list()
+        self.key_separation(inter_keys)
+        sorter = ExternalSorter(inter_keys, sorting_key, sort_memory)
+        aggregator = HashAggregator(self._keys_with_d, self._keys_with_m, sorting_key, group_memory)
+        with self.metrics.stage('process_fused') as record:
+            self._first_conversion_error = None
+            errors = self.metrics.conversion_errors
+            convert = RowCompiler.converter(inter_keys, self._keys_with_m, self._conversion_error, self._convert_row)
+            for file_name in self.list_of_file_names:
+                for dct in self.iter_projected(file_name, inter_keys):
+                    sorter.add(dct)
+                    aggregator.add(convert(dct))
+                    record['rows_in'] += 1
+                record['bytes_read'] += os.path.getsize(file_name)
+            record['conversion_errors'] = self.metrics.conversion_errors - errors
+            self._print_conversion_errors(record['conversion_errors'])
+        return sorter, aggregator
+
+    def process_pipelined(self, sorting_key='', workers=1, chunk_size=CSV_CHUNK_SIZE, batch_size=PIPELINE_BATCH_SIZE,
+                          queue_size=PIPELINE_QUEUE_SIZE, sort_memory=SORT_MEMORY_LIMIT,
+                          group_memory=AGGREGATION_MEMORY_LIMIT):
+        """
+        Pipelined version of process_fused. Every file, or every part of a large '.csv' file,
+        is read, parsed and converted by a worker process, which also sums the groups of every
+        batch of rows. Up to 'workers' parts are processed at a time, each sends its batches through
+        its own queue of queue_size batches, so the workers run ahead of the sorting and grouping
+        in this process only by a bounded number of rows. The parts are taken in the order of the files,
+        so the results are the same as process_fused gives.
+        Returns the sorter and the aggregator, iterating them yields the two results
+        """
+        inter_keys = self.intersection_keys()
+        if len(inter_keys) == 0:
+            return list(), list()
+        self.key_separation(inter_keys)
+        sorter = ExternalSorter(inter_keys, sorting_key, sort_memory)
+        aggregator = HashAggregator(self._keys_with_d, self._keys_with_m, sorting_key, group_memory)
+        with self.metrics.stage('process_pipelined') as record:
+            parts = iter(self._pipeline_parts(chunk_size))
+            context = multiprocessing.get_context()
+            running = collections.deque()
+            errors = 0
+            self._first_conversion_error = None
+            try:
+                while True:
+                    while len(running) < max(1, workers):
+                        part = next(parts, None)
+                        if part is None:
+                            break
+                        part_queue = context.Queue(queue_size)
+                        process = context.Process(target=_pipeline_worker, daemon=True,
+                                                  args=(part, inter_keys, self._keys_with_d, self._keys_with_m,
+                                                        sorting_key, batch_size, part_queue))
+                        process.start()
+                        running.append((process, part_queue))
+                    if len(running) == 0:
+                        break
+                    process, part_queue = running[0]
+                    while True:
+                        message = self._pipeline_message(process, part_queue)
+                        if message[0] == 'error':
+                            raise message[1]
+                        if message[0] == 'end':
+                            errors += message[1]
+                            if self._first_conversion_error is None:
+                                self._first_conversion_error = message[2]
+                            break
+                        batch, groups = message[1], message[2]
+                        for row in batch:
+                            sorter.add_row(row)
+                        count = record['rows_in']
+                        for key, accumulator in groups.items():
+                            position = accumulator[0]
+                            aggregator.add_group(key, (position[0], count + position[1]), accumulator[1:])
+                        record['rows_in'] += len(batch)
+                    running.popleft()
+                    process.join()
+            finally:
+                for process, part_queue in running:
+                    process.terminate()
+                    process.join()
+            record['bytes_read'] = sum(os.path.getsize(file_name) for file_name in self.list_of_file_names)
+            record['conversion_errors'] = errors
+            self.metrics.conversion_errors += errors
+            self._print_conversion_errors(errors)
+        return sorter, aggregator
+
+    def _pipeline_parts(self, chunk_size):
+        """Yields the parts of the files for process_pipelined: a file with no chunk or a part of a '.csv' file"""
+        for file_name in self.list_of_file_names:
+            file_type = _file_type(file_name)
+            if file_type not in ('.csv', '.json', '.xml', '.etlc'):
+                raise NameError("Acceptable file types - '.csv', '.json', '.xml', '.etlc'")
+            chunks = Element(file_name).csv_chunks(chunk_size) if file_type == '.csv' else None
+            if chunks is None:
+                yield file_name, None
+                continue
+            header, offsets = chunks
+            for start, end in offsets:
+                yield file_name, (header, start, end)
+        return
+
+    @staticmethod
+    def _pipeline_message(process, part_queue):
+        """Waits for the next message of the worker process, fails if the process has died without sending it"""
+        while True:
+            try:
+                return part_queue.get(timeout=1)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+            try:
+                return part_queue.get(timeout=1)
+            except queue.Empty:
+                raise RuntimeError('the worker process has exited with the code {}'.format(process.exitcode))
+
+    def write_partial(self, pathname, memory_limit=AGGREGATION_MEMORY_LIMIT):
+        """
+        Sums the groups of the files like iter_dictionary_comparison, but writes them into
+        a partial aggregate file, see HashAggregator.write_partial. The partial aggregates
+        of different sets of files are combined by HashAggregator.merge_partials
+        """
+        inter_keys = self.intersection_keys()
+        self.key_separation(inter_keys)
+        aggregator = HashAggregator(self._keys_with_d, self._keys_with_m, '', memory_limit)
+        with self.metrics.stage('write_partial') as record:
+            aggregator.extend(self.iter_value_conversion(self.iter_intersection()))
+            record['rows_in'] = aggregator._count
+            aggregator.write_partial(pathname, inter_keys)
+            record['bytes_written'] = os.path.getsize(pathname)
+        return
+
+    def table_value_conversion(self, table):
+        """
+        Columnar version of value_conversion. The 'M' columns of the table are already
+        converted, so only the values that could not be converted are reported.
+        Returns the dictionary of 'M' columns, a column with values that do not fit
+        into int64 is returned as a list of 'int'
+        """
+        self.key_separation(table.columns)
+        converted_columns = dict()
+        with self.metrics.stage('table_value_conversion', table.length) as record:
+            self._first_conversion_error = None
+            for key in self._keys_with_m:
+                for number, err in table.conversion_errors(key):
+                    record['conversion_errors'] += 1
+                    if self._first_conversion_error is None:
+                        self._first_conversion_error = err
+                converted_columns[key] = table.column(key)
+                wide_values = table.wide_values(key)
+                if len(wide_values) > 0:
+                    converted_columns[key] = [int(value) for value in converted_columns[key]]
+                    for number, value in wide_values.items():
+                        converted_columns[key][number] = value
+            record['rows_out'] = table.length
+            self.metrics.conversion_errors += record['conversion_errors']
+            self._print_conversion_errors(record['conversion_errors'])
+        return converted_columns
+
+    def table_dictionary_comparison(self, table, sorting_key=''):
+        """
+        Columnar version of dictionary_comparison. The sums are calculated over whole columns,
+        the groups are returned in the same order as dictionary_comparison gives
+        for the table sorted with sorting_key
+        """
+        with self.metrics.stage('table_dictionary_comparison', table.length) as record:
+            transformed_list_of_dicts = self._table_aggregation(table, sorting_key)
+            record['rows_out'] = len(transformed_list_of_dicts)
+        return transformed_list_of_dicts
+
+    def _table_aggregation(self, table, sorting_key):
+        converted_columns = self.table_value_conversion(table)
+        order = table.sort_order(sorting_key)
+        if table.length == 0:
+            return list()
+        codes = [table.column(key) for key in self._keys_with_d]
+        if numpy is not None:
+            group_keys, group_sums = self._numpy_aggregation(codes, converted_columns, order, table.length)
+        else:
+            groups = dict()
+            for number in order:
+                key = tuple([column[number] for column in codes])
+                values = groups.get(key)
+                if values is None:
+                    groups[key] = [converted_columns[m][number] for m in self._keys_with_m]
+                else:
+                    for index, m in enumerate(self._keys_with_m):
+                        values[index] += converted_columns[m][number]
+            group_keys, group_sums = groups.keys(), groups.values()
+
+        dictionaries = [table.dictionary(key) for key in self._keys_with_d]
+        transformed_list_of_dicts = list()
+        for keys, values in zip(group_keys, group_sums):
+            dct = dict()
+            for code, dictionary, d in zip(keys, dictionaries, self._keys_with_d):
+                dct[d] = dictionary[code]
+            for val, m in zip(values, self._keys_with_m):
+                dct[m.replace('M', 'MS')] = val
+            transformed_list_of_dicts.append(dct)
+        return transformed_list_of_dicts
+
+    def _numpy_aggregation(self, codes, converted_columns, order, length):
+        """
+        Groups the rows by the codes of the 'D' columns and sums the 'M' columns with NumPy.
+        The sums are int64 only if they can not overflow, otherwise they are Python 'int' objects
+        """
+        if len(codes) == 0:
+            inverse = numpy.zeros(length, dtype=numpy.int64)
+            unique_codes = numpy.zeros((1, 0), dtype=numpy.int64)
+        else:
+            unique_codes, inverse = numpy.unique(numpy.stack(codes, axis=1), axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+        positions = numpy.empty(length, dtype=numpy.int64)
+        positions[numpy.asarray(order, dtype=numpy.int64)] = numpy.arange(length)
+        first_positions = numpy.full(len(unique_codes), length, dtype=numpy.int64)
+        numpy.minimum.at(first_positions, inverse, positions)
+        group_order = numpy.argsort(first_positions, kind='stable')
+        dtype = numpy.int64
+        for m in self._keys_with_m:
+            column = converted_columns[m]
+            if isinstance(column, list) or len(column) > 0 and \
+                    max(-int(column.min()), int(column.max())) * length >= 2 ** 63:
+                dtype = object
+        sums = numpy.zeros((len(unique_codes), len(self._keys_with_m)), dtype=dtype)
+        for index, m in enumerate(self._keys_with_m):
+            numpy.add.at(sums[:, index], inverse, numpy.asarray(converted_columns[m], dtype=dtype))
+        return unique_codes[group_order].tolist(), sums[group_order].tolist()
+
     def dictionary_comparison(self, list_of_dicts):
         """
         Sums the values corresponding to the specified dictionary keys
         by unique combinations of dictionary values
         and forms a new list of dictionaries
         """
-        multi_key_dict = dict()
+        with self.metrics.stage('dictionary_comparison', len(list_of_dicts)) as record:
+            transformed_list_of_dicts = list(self.iter_dictionary_comparison(list_of_dicts))
+            record['rows_out'] = len(transformed_list_of_dicts)
+        return transformed_list_of_dicts
+
+    def iter_dictionary_comparison(self, list_of_dicts, sorting_key=None, memory_limit=AGGREGATION_MEMORY_LIMIT):
+        """
+        Streaming version of dictionary_comparison, the sums are calculated with HashAggregator
+        after the first row is received, so the keys can come from iter_value_conversion.
+        Only one entry per unique combination of values is kept in memory, up to memory_limit bytes.
+        The groups are yielded in the order of their first appearance. If sorting_key
+        is given, they are yielded in the order they would have after sorting the input
+        with sorted_list_of_dicts, so the input itself does not have to be sorted
+        """
+        rows = iter(list_of_dicts)
+        first = next(rows, None)
+        if first is None:
+            return
+        aggregator = HashAggregator(self._keys_with_d, self._keys_with_m, sorting_key, memory_limit)
+        aggregator.add(first)
+        aggregator.extend(rows)
+        yield from aggregator
+        return
+
+
+class _JsonFieldsStream:
+    """
+    Reads the records of the top-level 'fields' array of a JSON document one at a time.
+    The text is read in chunks into a window, each record is decoded with
+    json.JSONDecoder.raw_decode, and the consumed text is dropped from the window.
+    Malformed input raises json.JSONDecodeError with the position in the whole file
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, text_file):
+        self._file = text_file
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._offset = 0
+        self._lines = 0
+        self._column = 0
+        return
+
+    def __iter__(self):
+        char = self._skip_whitespace()
+        if char != '{':
+            yield from self._decode()['fields']
+            self._check_end()
+            return
+        self._pos += 1
+        found = False
+        char = self._skip_whitespace()
+        while char != '}':
+            if char != '"':
+                raise self._error('Expecting property name enclosed in double quotes', self._pos)
+            key = self._decode()
+            if self._skip_whitespace() != ':':
+                raise self._error("Expecting ':' delimiter", self._pos)
+            self._pos += 1
+            if key == 'fields' and self._skip_whitespace() == '[':
+                found = True
+                yield from self._iter_array()
+            else:
+                value = self._decode()
+                if key == 'fields':
+                    found = True
+                    yield from value
+            char = self._skip_whitespace()
+            if char == ',':
+                self._pos += 1
+                char = self._skip_whitespace()
+                if char == '}':
+                    raise self._error('Expecting property name enclosed in double quotes', self._pos)
+            elif char != '}':
+                raise self._error("Expecting ',' delimiter", self._pos)
+        self._pos += 1
+        self._check_end()
+        if not found:
+            raise KeyError('fields')
+        return
+
+    def _iter_array(self):
+        self._pos += 1
+        char = self._skip_whitespace()
+        if char == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._decode()
+            char = self._skip_whitespace()
+            self._pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise self._error("Expecting ',' delimiter", self._pos - 1)
+            self._skip_whitespace()
+
+    def _check_end(self):
+        if self._skip_whitespace() != '':
+            raise self._error('Extra data', self._pos)
+        return
+
+    def _fill(self):
+        """Reads the next chunk into the window, dropping the text that is already consumed"""
+        if self._eof:
+            return False
+        chunk = self._file.read(self.chunk_size)
+        if chunk == '':
+            self._eof = True
+            return False
+        consumed = self._buffer[:self._pos]
+        newline = consumed.rfind('\n')
+        if newline == -1:
+            self._column += len(consumed)
+        else:
+            self._lines += consumed.count('\n')
+            self._column = len(consumed) - newline - 1
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        """Skips whitespace and returns the next character, or '' at the end of the file"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\n\r':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _decode(self):
+        """Decodes one value, reading more text while the value may be incomplete"""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as err:
+                if self._fill():
+                    continue
+                raise self._error(err.msg, err.pos)
+            if end == len(self._buffer) and self._fill():
+                continue
+            if type(value) in (int, float) and self._buffer[end:].strip('0123456789.eE+-') == '' and self._fill():
+                # a number cut by the end of the window, like '12.' of '12.5', is decoded as its prefix
+                continue
+            self._pos = end
+            return value
+
+    def _error(self, msg, pos):
+        """Creates json.JSONDecodeError with the line, column and position in the whole file"""
+        err = json.JSONDecodeError(msg, self._buffer, pos)
+        lineno = self._lines + self._buffer.count('\n', 0, pos) + 1
+        if err.lineno == 1:
+            colno = self._column + pos + 1
+        else:
+            colno = err.colno
+        err.lineno, err.colno, err.pos = lineno, colno, self._offset + pos
+        err.args = ('{}: line {} column {} (char {})'.format(msg, lineno, colno, err.pos),)
+        return err
+
+
+def _project_csv(reader_csv, header, columns):
+    """
+    Yields dictionaries with only the specified columns from the rows of csv.reader,
+    the values are the same as csv.DictReader gives
+    """
+    indexes = {name: index for index, name in enumerate(header)}
+    picks = [(key, indexes[key]) for key in columns]
+    for row in reader_csv:
+        if row == []:
+            continue
+        length = len(row)
+        yield {key: row[index] if index < length else None for key, index in picks}
+    return
+
+
+def _read_file(file_name, columns=None):
+    """Reads the whole file in a worker process of ListElements.process_elements"""
+    list_elements = ListElements([file_name])
+    list_elements.process_elements(columns=columns)
+    return list_elements.elements[0].list_of_dicts
+
+
+def _read_csv_chunk(file_name, header, start, end, columns=None):
+    """Parses the part of the '.csv' file between the byte offsets in a worker process"""
+    return list(_iter_csv_chunk(file_name, header, start, end, columns))
+
+
+def _iter_csv_chunk(file_name, header, start, end, columns=None):
+    with open(file_name, 'rb') as csv_file, mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as csv_map:
+        text = csv_map[start:end].decode(locale.getpreferredencoding(False))
+    if columns is None:
+        yield from csv.DictReader(io.StringIO(text, newline=None), fieldnames=header)
+    else:
+        yield from _project_csv(csv.reader(io.StringIO(text, newline=None)), header, columns)
+    return
+
+
+def _pipeline_worker(part, keys, keys_with_d, keys_with_m, sorting_key, batch_size, out_queue):
+    """
+    Worker process of ListElements.process_pipelined. Parses one part of a file and puts into
+    the queue batches of the rows as tuples together with the groups of the batch summed
+    by HashAggregator, every group with the position of its first row in the batch.
+    The values are converted by the same function as in iter_value_conversion. The last message
+    has the number of values that could not be converted and the first error
+    """
+    try:
+        file_name, chunk = part
+        rows = Element(file_name).iter_rows(keys) if chunk is None else _iter_csv_chunk(file_name, *chunk, keys)
+        row_of = RowCompiler.tuple_getter(keys)
+        list_elements = ListElements([file_name])
+        list_elements.key_separation(keys)
+        list_elements._first_conversion_error = None
+        convert = RowCompiler.converter(keys, keys_with_m, list_elements._conversion_error,
+                                        list_elements._convert_row)
+        while True:
+            dicts = list(itertools.islice(rows, batch_size))
+            if len(dicts) == 0:
+                break
+            # a batch is small, its groups must stay in memory to be sent
+            aggregator = HashAggregator(keys_with_d, keys_with_m, sorting_key, sys.maxsize)
+            aggregator.extend(map(convert, dicts))
+            out_queue.put(('rows', list(map(row_of, dicts)), aggregator._groups))
+        first_error = list_elements._first_conversion_error
+        first_error = None if first_error is None else str(first_error)
+        out_queue.put(('end', list_elements.metrics.conversion_errors, first_error))
+    except Exception as err:
+        out_queue.put(('error', err))
+    return
+
+
+def _file_type(file_name):
+    """Returns the extension of the file without the extension of the compression: '.csv' for 'data.csv.gz'"""
+    root, extension = os.path.splitext(file_name)
+    if extension in COMPRESSION_CODECS:
+        extension = os.path.splitext(root)[1]
+    return extension
+
+
+def _open_file(file_name, mode='r', newline=None):
+    """
+    Opens the file like open(). A '.gz', '.bz2' or '.xz' file is decompressed while it is read
+    and compressed while it is written, the codec works in a background thread
+    on chunks of COMPRESSION_CHUNK_SIZE bytes, in parallel with the parsing
+    """
+    codec = COMPRESSION_CODECS.get(os.path.splitext(file_name)[1])
+    if codec is None:
+        return open(file_name, mode, newline=newline)
+    if 'r' in mode:
+        binary_file = io.BufferedReader(_DecompressingReader(codec, file_name), COMPRESSION_CHUNK_SIZE)
+    else:
+        binary_file = io.BufferedWriter(_CompressingWriter(codec, file_name), COMPRESSION_CHUNK_SIZE)
+    if 'b' in mode:
+        return binary_file
+    return io.TextIOWrapper(binary_file, newline=newline)
+
+
+class _DecompressingReader(io.RawIOBase):
+    """
+    Raw stream of the decompressed contents of the file. A background thread decompresses
+    the file chunk by chunk into a bounded queue, an error of the codec is raised by readinto
+    """
+
+    def __init__(self, codec, file_name):
+        super().__init__()
+        self._file = codec.open(file_name, 'rb')
+        self._queue = queue.Queue(COMPRESSION_QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._chunk = memoryview(b'')
+        self._offset = 0
+        self._finished = False
+        self._thread = threading.Thread(target=self._decompress, daemon=True)
+        self._thread.start()
+        return
+
+    def _decompress(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._file.read(COMPRESSION_CHUNK_SIZE)
+                self._queue.put(chunk)
+                if chunk == b'':
+                    break
+        except Exception as err:
+            self._queue.put(err)
+        return
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._offset == len(self._chunk):
+            if self._finished:
+                return 0
+            chunk = self._queue.get()
+            if isinstance(chunk, Exception):
+                self._finished = True
+                raise chunk
+            if chunk == b'':
+                self._finished = True
+                return 0
+            self._chunk, self._offset = memoryview(chunk), 0
+        size = min(len(buffer), len(self._chunk) - self._offset)
+        buffer[:size] = self._chunk[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+            self._file.close()
+        super().close()
+        return
+
+
+class _CompressingWriter(io.RawIOBase):
+    """
+    Raw stream that compresses the written data into the file. The chunks are passed
+    through a bounded queue to a background thread, an error of the codec is raised
+    by the next write or by close
+    """
+
+    def __init__(self, codec, file_name):
+        super().__init__()
+        self._file = codec.open(file_name, 'wb')
+        self._queue = queue.Queue(COMPRESSION_QUEUE_SIZE)
+        self._error = None
+        self._thread = threading.Thread(target=self._compress, daemon=True)
+        self._thread.start()
+        return
+
+    def _compress(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self._error is None:
+                try:
+                    self._file.write(chunk)
+                except Exception as err:
+                    self._error = err
+        return
+
+    def writable(self):
+        return True
+
+    def write(self, buffer):
+        if self._error is not None:
+            raise self._error
+        chunk = bytes(buffer)
+        self._queue.put(chunk)
+        return len(chunk)
+
+    def close(self):
+        if not self.closed:
+            self._queue.put(None)
+            self._thread.join()
+            try:
+                self._file.close()
+            finally:
+                super().close()
+            if self._error is not None:
+                raise self._error
+        return
+
+
+class RowCompiler:
+    """
+    Generates Python functions specialized for one layout of the rows: the keys are written
+    into the code as constants, so the hot loops run straight-line code instead of loops
+    over the keys, membership tests and comprehensions. The source of every function
+    is compiled once and cached, the functions for other layouts fall back to the generic code
+    """
+    _factories = dict()
+
+    @classmethod
+    def _build(cls, source, *arguments):
+        """Compiles the source of 'def make(...)' once and calls make with the arguments"""
+        factory = cls._factories.get(source)
+        if factory is None:
+            namespace = dict()
+            exec(compile(source, '<row function>', 'exec'), namespace)
+            factory = cls._factories[source] = namespace['make']
+        return factory(*arguments)
+
+    @staticmethod
+    def _tuple(items):
+        return '()' if len(items) == 0 else '({},)'.format(', '.join(items))
+
+    @staticmethod
+    def _dict(keys, items):
+        return '{{{}}}'.format(', '.join('{!r}: {}'.format(key, item) for key, item in zip(keys, items)))
+
+    @classmethod
+    def projector(cls, keys):
+        """Returns a function making a dictionary with only the keys, in their order"""
+        keys = list(keys)
+        source = 'def make():\n' \
+                 '    def project(dct):\n' \
+                 '        return {}\n' \
+                 '    return project\n'.format(cls._dict(keys, ['dct[{!r}]'.format(key) for key in keys]))
+        return cls._build(source)
+
+    @classmethod
+    def tuple_getter(cls, keys):
+        """Returns a function making a tuple of the values of the keys"""
+        source = 'def make():\n' \
+                 '    def values(dct):\n' \
+                 '        return {}\n' \
+                 '    return values\n'.format(cls._tuple(['dct[{!r}]'.format(key) for key in keys]))
+        return cls._build(source)
+
+    @classmethod
+    def key_sorter(cls, keys):
+        """
+        Returns a function making a copy of the dictionary with the keys in alphabetical order.
+        It is fastest for dictionaries with these keys, others are sorted by the generic code
+        """
+        keys = sorted(keys)
+        source = 'def make():\n' \
+                 '    def sort_keys(dct):\n' \
+                 '        if len(dct) == {}:\n' \
+                 '            try:\n' \
+                 '                return {}\n' \
+                 '            except KeyError:\n' \
+                 '                pass\n' \
+                 '        return {{k: dct[k] for k in sorted(dct)}}\n' \
+                 '    return sort_keys\n'.format(len(keys), cls._dict(keys, ['dct[{!r}]'.format(key) for key in keys]))
+        return cls._build(source)
+
+    @classmethod
+    def converter(cls, keys, keys_with_m, error, fallback):
+        """
+        Returns a function converting the values of keys_with_m to 'int' in a dictionary
+        with the keys in their order. A value that can not be converted is replaced
+        by error(err), dictionaries with other keys are converted by fallback(dct)
+        """
+        keys = list(keys)
+        names = ['v{}'.format(number) for number in range(len(keys))]
+        lines = ['def make(error, fallback):',
+                 '    def convert(dct):',
+                 '        if len(dct) != {}:'.format(len(keys)),
+                 '            return fallback(dct)',
+                 '        try:']
+        lines.extend('            {} = dct[{!r}]'.format(name, key) for name, key in zip(names, keys))
+        lines.extend(['        except KeyError:',
+                      '            return fallback(dct)'])
+        for name, key in zip(names, keys):
+            if key in keys_with_m:
+                lines.extend(['        try:',
+                              '            {0} = int({0})'.format(name),
+                              '        except ValueError as err:',
+                              '            {} = error(err)'.format(name)])
+        lines.extend(['        return {}'.format(cls._dict(keys, names)),
+                      '    return convert',
+                      ''])
+        return cls._build('\n'.join(lines), error, fallback)
+
+    @classmethod
+    def group_adder(cls, aggregator, sorting_column, track_position):
+        """
+        Returns the add function of the HashAggregator for rows with converted values:
+        the group key is built and the sums are updated by straight-line code
+        """
+        keys_with_m = aggregator.keys_with_m
+        key = cls._tuple(['dct.get({!r})'.format(d) for d in aggregator.keys_with_d])
+        if sorting_column is None:
+            position = '(aggregator._count,)'
+        else:
+            position = '(dct[{!r}], aggregator._count)'.format(sorting_column)
+        lines = ['def make(aggregator):',
+                 '    def add(dct):',
+                 '        key = {}'.format(key),
+                 '        position = {}'.format(position),
+                 '        aggregator._count += 1',
+                 '        accumulator = aggregator._groups.get(key)',
+                 '        if accumulator is None:',
+                 '            aggregator._new_group(key, [position{}])'.format(
+                     ''.join(', dct.get({!r})'.format(m) for m in keys_with_m)),
+                 '            return']
+        lines.extend('        accumulator[{}] += dct.get({!r})'.format(index, m)
+                     for index, m in enumerate(keys_with_m, 1))
+        if track_position:
+            lines.extend(['        if position < accumulator[0]:',
+                          '            accumulator[0] = position'])
+        lines.extend(['    return add', ''])
+        return cls._build('\n'.join(lines), aggregator)
+
+
+class ExternalSorter:
+    """
+    Sorts dictionaries with the same keys by the values of the sorting key
+    with a bounded amount of memory.
+    The rows are kept as tuples in a buffer, when the buffer exceeds memory_limit bytes
+    it is sorted and spilled into a temporary file as a run. The runs are merged
+    with a k-way merge. The sort is stable, so the result is the same as sorted_list_of_dicts.
+    The order of the rows is checked while they are added, a buffer that is already sorted
+    is used as it is
+    """
+    chunk_size = 1024
+    max_runs = 64
+
+    def __init__(self, keys, sorting_key='', memory_limit=SORT_MEMORY_LIMIT):
+        self.keys = sorted(keys)
+        self.memory_limit = memory_limit
+        self._sorting_index = self.keys.index(ListElements.sorting_column(self.keys, sorting_key))
+        self._row_of = RowCompiler.tuple_getter(self.keys)
+        self._buffer = list()
+        self._buffer_size = 0
+        self._buffer_sorted = True
+        self._runs = list()
+        self._run_count = 0
+        self._tempdir = None
+        return
+
+    def is_sorted(self, list_of_dicts):
+        """Checks whether the dictionaries are already ordered by the sorting key"""
+        sorting_key = self.keys[self._sorting_index]
+        previous = None
+        for number, dct in enumerate(list_of_dicts):
+            if number > 0 and dct[sorting_key] < previous:
+                return False
+            previous = dct[sorting_key]
+        return True
+
+    def add(self, dct):
+        self.add_row(self._row_of(dct))
+        return
+
+    def add_row(self, row):
+        """Adds a row given as a tuple of the values of the keys in alphabetical order"""
+        if self._buffer_sorted and len(self._buffer) > 0 and \
+                row[self._sorting_index] < self._buffer[-1][self._sorting_index]:
+            self._buffer_sorted = False
+        self._buffer.append(row)
+        self._buffer_size += sys.getsizeof(row) + sum(map(sys.getsizeof, row))
+        if self._buffer_size >= self.memory_limit:
+            self._spill()
+        return
+
+    def extend(self, list_of_dicts):
         for dct in list_of_dicts:
-            key = tuple([dct.get(key) for key in self._keys_with_d])
-            if key in multi_key_dict:
-                value = [dct.get(key) for key in self._keys_with_m]
-                multi_key_dict[key] = list(map(lambda a, b: a + b, multi_key_dict[key], value))
+            self.add(dct)
+        return
+
+    def add_run(self, list_of_dicts):
+        """
+        Adds dictionaries which are already sorted. They are not buffered,
+        the iterable is consumed only during the merge
+        """
+        self._spill()
+        self._runs.append(map(self._row_of, list_of_dicts))
+        return
+
+    def __iter__(self):
+        """Yields the sorted dictionaries and removes the temporary files"""
+        try:
+            if len(self._runs) == 0:
+                self._sort_buffer()
+                rows = self._buffer
             else:
-                multi_key_dict[key] = [dct.get(key) for key in self._keys_with_m]
+                self._spill()
+                while len(self._runs) > self.max_runs:
+                    self._merge_runs()
+                rows = self._merge(self._runs)
+            for row in rows:
+                yield dict(zip(self.keys, row))
+        finally:
+            self._buffer = list()
+            self._buffer_size = 0
+            self._buffer_sorted = True
+            self._runs = list()
+            if self._tempdir is not None:
+                self._tempdir.cleanup()
+                self._tempdir = None
+        return
 
-        transformed_list_of_dicts = list()
-        for keys, values in multi_key_dict.items():
+    def _merge(self, runs):
+        return heapq.merge(*runs, key=operator.itemgetter(self._sorting_index))
+
+    def _merge_runs(self):
+        """Merges the first max_runs runs into one, so that not too many files are open at once"""
+        runs = self._runs[:self.max_runs]
+        self._runs[:self.max_runs] = [self._write_run(self._merge(runs))]
+        return
+
+    def _spill(self):
+        if len(self._buffer) == 0:
+            return
+        self._sort_buffer()
+        self._runs.append(self._write_run(self._buffer))
+        self._buffer = list()
+        self._buffer_size = 0
+        self._buffer_sorted = True
+        return
+
+    def _sort_buffer(self):
+        if not self._buffer_sorted:
+            self._buffer.sort(key=operator.itemgetter(self._sorting_index))
+        return
+
+    def _write_run(self, rows):
+        """Writes the rows into a temporary file in chunks encoded with marshal"""
+        if self._tempdir is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix='simple_etl_')
+        pathname = os.path.join(self._tempdir.name, 'run_{}'.format(self._run_count))
+        self._run_count += 1
+        with open(pathname, 'wb') as run_file:
+            rows = iter(rows)
+            chunk = list(itertools.islice(rows, self.chunk_size))
+            while chunk:
+                marshal.dump(chunk, run_file)
+                chunk = list(itertools.islice(rows, self.chunk_size))
+        return self._read_run(pathname)
+
+    @staticmethod
+    def _read_run(pathname):
+        with open(pathname, 'rb') as run_file:
+            while True:
+                try:
+                    chunk = marshal.load(run_file)
+                except EOFError:
+                    break
+                yield from chunk
+        os.remove(pathname)
+        return
+
+
+class ColumnarTable:
+    """
+    Rows stored by columns. The values of the 'M' columns are converted to 'int' when
+    they are added and kept in int64 arrays, the values of the other columns are
+    dictionary-encoded: every distinct value is stored once, the column keeps integer codes.
+    A value of an 'M' column whose text differs from its 'int' (like 'ex' or '01')
+    or whose 'int' does not fit into int64 is kept as it was, so that the rows can be restored exactly
+    """
+
+    magic = b'ETLC'
+    version = 1
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.length = 0
+        self._codes = dict()
+        self._dictionaries = dict()
+        self._values = dict()
+        self._raw = dict()
+        for name in self.columns:
+            if name.startswith('M'):
+                self._values[name] = array.array('q')
+                self._raw[name] = dict()
+            else:
+                self._codes[name] = array.array('q')
+                self._dictionaries[name] = list()
+        self._indexes = {name: dict() for name in self._codes}
+        return
+
+    @classmethod
+    def from_rows(cls, columns, list_of_dicts):
+        table = cls(columns)
+        table.extend(list_of_dicts)
+        return table
+
+    def append(self, dct):
+        number = self.length
+        for name, codes in self._codes.items():
+            value = dct[name]
+            index = self._indexes[name]
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(index)
+                self._dictionaries[name].append(value)
+            codes.append(code)
+        for name, values in self._values.items():
+            value = dct[name]
+            if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+                values.append(value)
+                continue
+            try:
+                converted = int(value)
+                values.append(converted)
+            except (ValueError, TypeError, OverflowError):
+                converted = None
+                values.append(0)
+            if converted is None or str(converted) != str(value):
+                self._raw[name][number] = value
+        self.length += 1
+        return
+
+    def extend(self, list_of_dicts):
+        for dct in list_of_dicts:
+            self.append(dct)
+        return
+
+    def column(self, name):
+        """
+        Returns the codes of a dictionary-encoded column or the values of an 'M' column,
+        as a NumPy array when NumPy is available, without copying
+        """
+        data = self._values[name] if name in self._values else self._codes[name]
+        if numpy is not None:
+            if len(data) == 0:
+                return numpy.zeros(0, dtype=numpy.int64)
+            return numpy.frombuffer(data, dtype=numpy.int64)
+        return data
+
+    def dictionary(self, name):
+        """Returns the list of distinct values of a dictionary-encoded column, indexed by code"""
+        return self._dictionaries[name]
+
+    def conversion_errors(self, name):
+        """Returns the row numbers and values of an 'M' column that could not be converted to 'int'"""
+        errors = list()
+        for number, value in sorted(self._raw[name].items()):
+            try:
+                int(value)
+            except (ValueError, TypeError) as err:
+                errors.append((number, err))
+        return errors
+
+    def wide_values(self, name):
+        """
+        Returns the 'int' values of an 'M' column which do not fit into int64 by their row numbers,
+        the column keeps 0 for them
+        """
+        values = dict()
+        for number, value in self._raw[name].items():
+            try:
+                converted = int(value)
+            except (ValueError, TypeError):
+                continue
+            if not -2 ** 63 <= converted < 2 ** 63:
+                values[number] = converted
+        return values
+
+    def project(self, columns):
+        """Returns a table with only the specified columns, the column data is shared, not copied"""
+        table = ColumnarTable(list())
+        table.columns = list(columns)
+        table.length = self.length
+        for name in columns:
+            if name in self._values:
+                table._values[name] = self._values[name]
+                table._raw[name] = self._raw[name]
+            else:
+                table._codes[name] = self._codes[name]
+                table._dictionaries[name] = self._dictionaries[name]
+                table._indexes[name] = self._indexes[name]
+        return table
+
+    @classmethod
+    def concatenate(cls, tables, columns):
+        """Joins the rows of tables that have the specified columns, the codes are re-encoded"""
+        result = cls(columns)
+        for table in tables:
+            for name in result._codes:
+                index = result._indexes[name]
+                dictionary = result._dictionaries[name]
+                mapping = array.array('q')
+                for value in table._dictionaries[name]:
+                    code = index.get(value)
+                    if code is None:
+                        code = index[value] = len(index)
+                        dictionary.append(value)
+                    mapping.append(code)
+                if numpy is not None and table.length > 0:
+                    codes = numpy.frombuffer(mapping, dtype=numpy.int64)[table.column(name)]
+                    result._codes[name].frombytes(codes.tobytes())
+                else:
+                    result._codes[name].extend([mapping[code] for code in table._codes[name]])
+            for name in result._values:
+                result._values[name].frombytes(memoryview(table._values[name]).cast('B'))
+                result._raw[name].update((number + result.length, value)
+                                         for number, value in table._raw[name].items())
+            result.length += table.length
+        return result
+
+    def to_file(self, pathname):
+        """
+        Writes the table into a '.etlc' file: the magic bytes, the version and the size of the header,
+        the header in JSON with the schema, the dictionaries of the dictionary-encoded columns
+        and the values that differ from their 'int', and then the int64 data of every column.
+        The data starts at a multiple of 8 bytes, so it can be memory-mapped as it is
+        """
+        columns = list()
+        for number, name in enumerate(self.columns):
+            column = {'name': name, 'offset': 8 * self.length * number}
+            if name in self._codes:
+                column['dictionary'] = self._dictionaries[name]
+            else:
+                column['raw'] = sorted(self._raw[name].items())
+            columns.append(column)
+        header = json.dumps({'length': self.length, 'byteorder': sys.byteorder, 'columns': columns}).encode()
+        prefix = struct.pack('<4sIQ', self.magic, self.version, len(header))
+        with _open_file(pathname, 'wb') as table_file:
+            table_file.write(prefix)
+            table_file.write(header)
+            table_file.write(bytes(self._data_start(len(header)) - len(prefix) - len(header)))
+            for name in self.columns:
+                data = self._codes[name] if name in self._codes else self._values[name]
+                table_file.write(memoryview(data).cast('B'))
+        return
+
+    @classmethod
+    def from_file(cls, pathname, columns=None):
+        """
+        Reads a '.etlc' file written by to_file, only the specified columns if they are given.
+        The file is memory-mapped and the columns refer to the mapped data without copying,
+        so the table can not be extended. A compressed file is decompressed into memory.
+        A file that is not a '.etlc' file or is truncated raises ValueError
+        """
+        not_etlc = ValueError("'{}' is not a '.etlc' file of version {}".format(pathname, cls.version))
+        prefix_size = struct.calcsize('<4sIQ')
+        if _file_type(pathname) == os.path.splitext(pathname)[1]:
+            if os.path.getsize(pathname) < prefix_size:
+                raise not_etlc
+            with open(pathname, 'rb') as table_file:
+                data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with _open_file(pathname, 'rb') as table_file:
+                data = table_file.read()
+        if len(data) < prefix_size or struct.unpack_from('<4sI', data) != (cls.magic, cls.version):
+            raise not_etlc
+        header_size = struct.unpack_from('<Q', data, 8)[0]
+        if len(data) < prefix_size + header_size:
+            raise not_etlc
+        header = json.loads(bytes(data[prefix_size:prefix_size + header_size]).decode())
+        start = cls._data_start(header_size)
+        table = cls(list())
+        table.length = header['length']
+        schema = {column['name']: column for column in header['columns']}
+        table.columns = list(schema) if columns is None else list(columns)
+        view = memoryview(data)
+        for name in table.columns:
+            column = schema[name]
+            begin = start + column['offset']
+            if begin + 8 * table.length > len(data):
+                raise not_etlc
+            values = view[begin:begin + 8 * table.length].cast('q')
+            if header['byteorder'] != sys.byteorder:
+                values = array.array('q', values)
+                values.byteswap()
+            if 'dictionary' in column:
+                table._codes[name] = values
+                table._dictionaries[name] = column['dictionary']
+                table._indexes[name] = dict()
+            else:
+                table._values[name] = values
+                table._raw[name] = {number: value for number, value in column['raw']}
+        return table
+
+    @staticmethod
+    def _data_start(header_size):
+        return (struct.calcsize('<4sIQ') + header_size + 7) // 8 * 8
+
+    def sort_order(self, sorting_key=''):
+        """
+        Returns the row numbers in the order of a stable sort by the values of the sorting key,
+        the same order as sorted_list_of_dicts gives
+        """
+        if self.length == 0:
+            return list()
+        name = ListElements.sorting_column(self.columns, sorting_key)
+        if name in self._codes:
+            dictionary = self._dictionaries[name]
+            ranks = [0] * len(dictionary)
+            for rank, code in enumerate(sorted(range(len(dictionary)), key=dictionary.__getitem__)):
+                ranks[code] = rank
+            if numpy is not None:
+                keys = numpy.array(ranks, dtype=numpy.int64)[self.column(name)]
+                return numpy.argsort(keys, kind='stable').tolist()
+            buckets = [list() for _ in ranks]
+            for number, code in enumerate(self._codes[name]):
+                buckets[ranks[code]].append(number)
+            return list(itertools.chain.from_iterable(buckets))
+        values = self._values[name]
+        return sorted(range(self.length), key=values.__getitem__)
+
+    def iter_rows(self, order=None):
+        """Yields the rows as dictionaries, in the order of the row numbers if it is given"""
+        columns = list()
+        for name in self.columns:
+            if name in self._codes:
+                columns.append((name, self._codes[name], self._dictionaries[name], None))
+            else:
+                columns.append((name, self._values[name], None, self._raw[name]))
+        for number in (range(self.length) if order is None else order):
             dct = dict()
-            for key, d in zip(keys, self._keys_with_d):
-                dct[d] = key
-            for val, m in zip(values, self._keys_with_m):
-                dct[m.replace('M', 'MS')] = val
-            transformed_list_of_dicts.append(dct)
-        return transformed_list_of_dicts
+            for name, data, dictionary, raw in columns:
+                if dictionary is not None:
+                    dct[name] = dictionary[data[number]]
+                elif number in raw:
+                    dct[name] = raw[number]
+                else:
+                    dct[name] = data[number]
+            yield dct
+        return
+
+
+class HashAggregator:
+    """
+    Sums the values of the 'M' keys by unique combinations of the values of the 'D' keys.
+    Every group has one list with its position and its sums, which is updated in place.
+    When the groups take more than memory_limit bytes, they are spilled into temporary
+    files partitioned by the hash of the group key, and every partition is aggregated
+    separately at the end. The groups are yielded in the order of their first appearance,
+    or, if sorting_key is given, in the order they would have in the sorted input
+    """
+    partitions = 16
+
+    def __init__(self, keys_with_d, keys_with_m, sorting_key=None, memory_limit=AGGREGATION_MEMORY_LIMIT):
+        self.keys_with_d = list(keys_with_d)
+        self.keys_with_m = list(keys_with_m)
+        self.sorting_key = sorting_key
+        self.memory_limit = memory_limit
+        self._groups = dict()
+        self._groups_size = 0
+        self._count = 0
+        self._tempdir = None
+        self._partition_files = None
+        return
+
+    def add(self, dct):
+        """
+        Adds a row with converted values. The first row fixes the layout, the following rows
+        are added by the function generated for it, see RowCompiler.group_adder
+        """
+        sorting_column = None
+        track_position = False
+        if self.sorting_key is not None:
+            sorting_column = ListElements.sorting_column(dct.keys(), self.sorting_key)
+            track_position = sorting_column not in self.keys_with_d
+        self.add = RowCompiler.group_adder(self, sorting_column, track_position)
+        self.add(dct)
+        return
+
+    def add_group(self, key, position, sums):
+        """
+        Adds a group summed elsewhere: the tuple of its 'D' values, the position of its first row
+        and the list of its sums. The position must be comparable with the positions of add
+        """
+        accumulator = self._groups.get(key)
+        if accumulator is None:
+            accumulator = [position]
+            accumulator.extend(sums)
+            self._new_group(key, accumulator)
+            return
+        for index, value in enumerate(sums, 1):
+            accumulator[index] += value
+        if position < accumulator[0]:
+            accumulator[0] = position
+        return
+
+    def _new_group(self, key, accumulator):
+        self._groups[key] = accumulator
+        self._groups_size += sys.getsizeof(key) + sum(map(sys.getsizeof, key)) + \
+            sys.getsizeof(accumulator) + 32 * len(accumulator) + 100
+        if self._groups_size >= self.memory_limit:
+            self._spill()
+        return
+
+    def extend(self, list_of_dicts):
+        for dct in list_of_dicts:
+            self.add(dct)
+        return
+
+    def __iter__(self):
+        """Yields the dictionaries with the 'D' values and the 'MS' sums, removes the temporary files"""
+        try:
+            if self._partition_files is None:
+                groups = self._groups.items()
+                if self.sorting_key is not None:
+                    groups = sorted(groups, key=lambda item: item[1][0])
+                for key, accumulator in groups:
+                    yield self._result(key, accumulator)
+                return
+            self._spill()
+            sorter = ExternalSorter(['group', 'position'], 'position', self.memory_limit)
+            for pathname in self._close_partitions():
+                for key, accumulator in self._aggregate_partition(pathname, 1):
+                    sorter.add({'group': (key, accumulator[1:]), 'position': accumulator[0]})
+            for dct in sorter:
+                key, sums = dct['group']
+                yield self._result(key, [None] + list(sums))
+        finally:
+            self._clear()
+        return
+
+    def _clear(self):
+        self._groups = dict()
+        self._groups_size = 0
+        if self._partition_files is not None:
+            for partition_file in self._partition_files:
+                partition_file.close()
+            self._partition_files = None
+        if self._tempdir is not None:
+            self._tempdir.cleanup()
+            self._tempdir = None
+        return
+
+    def write_partial(self, pathname, keys):
+        """
+        Writes the groups with their positions and sums into a partial aggregate file instead of
+        yielding the results, keys are the keys of the rows that were added. The groups are written
+        by the partitions of the hash of their 'D' values, every partition completely summed,
+        see PartialAggregate. The aggregator must have been created with a sorting key
+        """
+        header = {'keys': list(keys), 'keys_with_d': self.keys_with_d, 'keys_with_m': self.keys_with_m,
+                  'sorting_column': ListElements.sorting_column(keys, self.sorting_key) if len(keys) > 0 else None,
+                  'rows': self._count, 'partitions': self.partitions, 'offsets': list()}
+        try:
+            self._spill()
+            pathnames = [None] * self.partitions if self._partition_files is None else self._close_partitions()
+            with open(pathname, 'wb') as partial_file:
+                partial_file.write(PartialAggregate.magic)
+                for partition_name in pathnames:
+                    header['offsets'].append(partial_file.tell())
+                    if partition_name is None:
+                        continue
+                    groups = self._aggregate_partition(partition_name, 1)
+                    while True:
+                        chunk = list(itertools.islice(groups, PARTIAL_CHUNK_SIZE))
+                        if len(chunk) == 0:
+                            break
+                        marshal.dump(chunk, partial_file)
+                header['offsets'].append(partial_file.tell())
+                marshal.dump(header, partial_file)
+                partial_file.write(struct.pack('<Q', header['offsets'][-1]))
+        finally:
+            self._clear()
+        return
+
+    def add_partial(self, partial, shard, sorting_column):
+        """
+        Adds the groups of a PartialAggregate, shard is the number of the partial in the order
+        of the inputs and sorting_column is the column the merged groups are ordered by.
+        The aggregator must have the 'D' and 'M' keys common to all partials.
+        The keys the aggregator does not have are dropped and the groups that become equal
+        are summed. When the 'D' keys are the same, the partitions of the file are copied
+        into the partitions of the aggregator as they are, without being held in memory
+        """
+        d_indexes = [partial.keys_with_d.index(d) for d in self.keys_with_d]
+        m_indexes = [partial.keys_with_m.index(m) + 1 for m in self.keys_with_m]
+        if sorting_column == partial.sorting_column:
+            sort_index = None
+        elif sorting_column in self.keys_with_d:
+            sort_index = partial.keys_with_d.index(sorting_column)
+        else:
+            raise ValueError('the partial aggregates are sorted by different keys: {}, {}'.format(
+                sorting_column, partial.sorting_column))
+        same_partitions = partial.keys_with_d == self.keys_with_d and partial.partitions == self.partitions
+        for number in range(partial.partitions):
+            for chunk in partial.iter_chunks(number):
+                groups = list()
+                for key, accumulator in chunk:
+                    sort_value, row = accumulator[0]
+                    if sort_index is not None:
+                        sort_value = key[sort_index]
+                    groups.append((tuple([key[index] for index in d_indexes]), (sort_value, shard, row),
+                                   [accumulator[index] for index in m_indexes]))
+                if same_partitions:
+                    self._open_partitions()
+                    marshal.dump([(key, [position] + sums) for key, position, sums in groups],
+                                 self._partition_files[number])
+                    continue
+                for key, position, sums in groups:
+                    self.add_group(key, position, sums)
+        return
+
+    @classmethod
+    def merge_partials(cls, pathnames, memory_limit=AGGREGATION_MEMORY_LIMIT):
+        """
+        Combines partial aggregate files written by write_partial. Iterating the returned aggregator
+        yields the same results as one aggregator over the inputs of all partials in the order
+        of the pathnames. Only the keys present in all partials are kept
+        """
+        partials = [PartialAggregate(pathname) for pathname in pathnames]
+        keys = set(partials[0].keys) if len(partials) > 0 else set()
+        for partial in partials[1:]:
+            keys.intersection_update(partial.keys)
+        keys = sorted(keys)
+        sorting_column = ListElements.sorting_column(keys, '') if len(keys) > 0 else None
+        aggregator = cls([key for key in keys if key.startswith('D')], [key for key in keys if key.startswith('M')],
+                         '', memory_limit)
+        for shard, partial in enumerate(partials):
+            aggregator.add_partial(partial, shard, sorting_column)
+        return aggregator
+
+    def _result(self, key, accumulator):
+        dct = dict()
+        for value, d in zip(key, self.keys_with_d):
+            dct[d] = value
+        for value, m in zip(accumulator[1:], self.keys_with_m):
+            dct[m.replace('M', 'MS')] = value
+        return dct
+
+    @staticmethod
+    def partition_of(key, partitions, level=0):
+        """Returns the partition of the group key, the hash does not depend on the process"""
+        return zlib.crc32(repr((level, key)).encode()) % partitions
+
+    def _spill(self):
+        """Writes the groups into the partition files and clears them"""
+        if len(self._groups) == 0:
+            return
+        self._open_partitions()
+        self._write_partitions(self._groups.items(), self._partition_files, 0)
+        self._groups = dict()
+        self._groups_size = 0
+        return
+
+    def _open_partitions(self):
+        if self._partition_files is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix='simple_etl_')
+            self._partition_files = [open(os.path.join(self._tempdir.name, 'partition_{}'.format(number)), 'wb')
+                                     for number in range(self.partitions)]
+        return
+
+    @classmethod
+    def _write_partitions(cls, groups, partition_files, level):
+        chunks = [list() for _ in partition_files]
+        for key, accumulator in groups:
+            chunks[cls.partition_of(key, len(partition_files), level)].append((key, accumulator))
+        for chunk, partition_file in zip(chunks, partition_files):
+            if len(chunk) > 0:
+                marshal.dump(chunk, partition_file)
+        return
+
+    def _close_partitions(self):
+        pathnames = [partition_file.name for partition_file in self._partition_files]
+        for partition_file in self._partition_files:
+            partition_file.close()
+        self._partition_files = list()
+        return pathnames
+
+    @staticmethod
+    def _read_partition(pathname):
+        with open(pathname, 'rb') as partition_file:
+            while True:
+                try:
+                    chunk = marshal.load(partition_file)
+                except EOFError:
+                    break
+                yield from chunk
+        return
+
+    def _aggregate_partition(self, pathname, level):
+        """
+        Merges the partial groups of one partition in memory. If they still take
+        more than memory_limit bytes, the partition is split again with another hash
+        """
+        groups = dict()
+        size = 0
+        split_files = None
+        for key, accumulator in self._read_partition(pathname):
+            current = groups.get(key)
+            if current is None:
+                groups[key] = list(accumulator)
+                size += sys.getsizeof(key) + sum(map(sys.getsizeof, key)) + 32 * len(accumulator) + 100
+                if size >= self.memory_limit and level < 8:
+                    if split_files is None:
+                        split_files = [open('{}_{}'.format(pathname, number), 'wb')
+                                       for number in range(self.partitions)]
+                    self._write_partitions(groups.items(), split_files, level)
+                    groups = dict()
+                    size = 0
+                continue
+            for index in range(1, len(accumulator)):
+                current[index] += accumulator[index]
+            if accumulator[0] < current[0]:
+                current[0] = accumulator[0]
+        os.remove(pathname)
+        if split_files is None:
+            yield from groups.items()
+            return
+        self._write_partitions(groups.items(), split_files, level)
+        for split_file in split_files:
+            split_file.close()
+        for split_file in split_files:
+            yield from self._aggregate_partition(split_file.name, level + 1)
+        return
+
+
+class PartialAggregate:
+    """
+    Partial aggregate file written by HashAggregator.write_partial. It starts with the magic bytes,
+    then go the partitions one after another, each as marshal chunks of (key, accumulator) pairs,
+    where the accumulator is [(sort_value, row), sums...], then the header in marshal format
+    with the keys of the rows, the 'D' and 'M' keys, the sorting column, the number of rows
+    and the offsets of the partitions, and at the end the offset of the header
+    """
+    magic = b'ETLPART\x01'
+
+    def __init__(self, pathname):
+        self.pathname = pathname
+        with open(pathname, 'rb') as partial_file:
+            if partial_file.read(len(self.magic)) != self.magic:
+                raise ValueError("'{}' is not a partial aggregate file".format(pathname))
+            partial_file.seek(-8, os.SEEK_END)
+            partial_file.seek(struct.unpack('<Q', partial_file.read(8))[0])
+            header = marshal.load(partial_file)
+        self.keys = header['keys']
+        self.keys_with_d = header['keys_with_d']
+        self.keys_with_m = header['keys_with_m']
+        self.sorting_column = header['sorting_column']
+        self.rows = header['rows']
+        self.partitions = header['partitions']
+        self._offsets = header['offsets']
+        return
+
+    def iter_chunks(self, number):
+        """Yields the chunks of (key, accumulator) pairs of the partition"""
+        with open(self.pathname, 'rb') as partial_file:
+            partial_file.seek(self._offsets[number])
+            while partial_file.tell() < self._offsets[number + 1]:
+                yield marshal.load(partial_file)
+        return
+
+
+class ParseCache:
+    """
+    On-disk cache of the rows parsed from the files, used by ListElements.process_elements.
+    An entry is found by the path, the size and the modification time of the file, the columns
+    that were read and, if hash_content is set, the SHA-256 of the file contents.
+    The rows are stored in marshal format: the distinct lists of keys once,
+    and the values of every row as a tuple. When the entries take more than max_size bytes,
+    the least recently used are removed. In a long-running process up to memory_entries
+    recently used entries are also kept in memory, so they are not even unmarshalled.
+    If an entry can not be written (a full disk, no permission), the file is just not cached
+    """
+    version = 1
+
+    def __init__(self, cache_dir=None, max_size=CACHE_SIZE_LIMIT, hash_content=False, memory_entries=0):
+        self.cache_dir = self.default_dir() if cache_dir is None else cache_dir
+        self.max_size = max_size
+        self.hash_content = hash_content
+        self.memory_entries = memory_entries
+        self._memory = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self._store_failed = False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return
+
+    @staticmethod
+    def default_dir():
+        """Returns the default directory of the cache, simple_etl in the user cache directory"""
+        return os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'simple_etl')
+
+    def entry_name(self, file_name, columns=None):
+        """Returns the path of the cache entry for the current state of the file"""
+        stat = os.stat(file_name)
+        key = [self.version, os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns,
+               None if columns is None else list(columns)]
+        if self.hash_content:
+            content_hash = hashlib.sha256()
+            with open(file_name, 'rb') as content_file:
+                for block in iter(lambda: content_file.read(1024 * 1024), b''):
+                    content_hash.update(block)
+            key.append(content_hash.hexdigest())
+        return os.path.join(self.cache_dir, hashlib.sha256(repr(key).encode()).hexdigest() + '.cache')
+
+    def load(self, file_name, columns=None):
+        """Returns the cached list of dictionaries of the file, or None if there is no entry"""
+        pathname = self.entry_name(file_name, columns)
+        list_of_dicts = self._memory.get(pathname)
+        if list_of_dicts is not None and os.path.exists(pathname):
+            self._memory.move_to_end(pathname)
+            os.utime(pathname)
+            self.hits += 1
+            return list(list_of_dicts)
+        try:
+            with open(pathname, 'rb') as cache_file:
+                list_of_keys, rows = marshal.load(cache_file)
+            os.utime(pathname)
+        except (OSError, EOFError, ValueError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        list_of_dicts = [dict(zip(list_of_keys[index], values)) for index, values in rows]
+        self._remember(pathname, list_of_dicts)
+        return list(list_of_dicts)
+
+    def store(self, file_name, list_of_dicts, columns=None):
+        """Saves the list of dictionaries of the file. Files without rows are not cached"""
+        if len(list_of_dicts) == 0:
+            return
+        indexes = dict()
+        rows = list()
+        for dct in list_of_dicts:
+            keys = tuple(dct.keys())
+            index = indexes.get(keys)
+            if index is None:
+                index = indexes[keys] = len(indexes)
+            rows.append((index, tuple(dct.values())))
+        pathname = self.entry_name(file_name, columns)
+        temp_name = '{}.{}.tmp'.format(pathname, os.getpid())
+        try:
+            with open(temp_name, 'wb') as cache_file:
+                marshal.dump((list(indexes), rows), cache_file)
+            os.replace(temp_name, pathname)
+        except (ValueError, OSError) as err:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            if isinstance(err, OSError) and not self._store_failed:
+                self._store_failed = True
+                print('\nError writing the cache:  {}'.format(err))
+            return
+        self.stored += 1
+        self._remember(pathname, list(list_of_dicts))
+        self.evict()
+        return
+
+    def _remember(self, pathname, list_of_dicts):
+        if self.memory_entries <= 0:
+            return
+        self._memory[pathname] = list_of_dicts
+        self._memory.move_to_end(pathname)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+        return
+
+    def evict(self):
+        """Removes the least recently used entries while the cache is larger than max_size"""
+        entries = list()
+        try:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.cache'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except OSError:
+            return
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, pathname in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(pathname)
+            except OSError:
+                continue
+            self._memory.pop(pathname, None)
+            total_size -= size
+            self.evicted += 1
+        return
+
+    def statistics(self):
+        return {'hits': self.hits, 'misses': self.misses, 'stored': self.stored, 'evicted': self.evicted}
+
+
+class Metrics:
+    """
+    Collects the metrics of the stages of a run: wall time, rows in and out, bytes read
+    and written, the peak resident set size of the process and the number of values that
+    could not be converted to 'int'. The time of a stage includes the stages inside it,
+    the conversion errors are added to the total by the code that counts them.
+    Hooks are called as hook(event, name, record) with the event 'start' or 'end',
+    so an external profiler can be attached to the stages
+    """
+
+    def __init__(self):
+        self.stages = list()
+        self.conversion_errors = 0
+        self._hooks = list()
+        return
+
+    def add_hook(self, hook):
+        self._hooks.append(hook)
+        return
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+        return
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=0):
+        """Context manager measuring a stage, the code inside fills the counters of the record"""
+        record = self._start(name, rows_in)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            self._end(name, record)
+        return
+
+    def iter_stage(self, name, iterable):
+        """
+        Measures a stage made of an iterator: the rows passing through are counted,
+        the time is the time spent in the iterator and in everything it pulls from
+        """
+        record = self._start(name, 0)
+        rows = iter(iterable)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    dct = next(rows)
+                except StopIteration:
+                    break
+                finally:
+                    record['seconds'] += time.perf_counter() - start
+                record['rows_out'] += 1
+                yield dct
+        finally:
+            self._end(name, record)
+        return
+
+    def _start(self, name, rows_in):
+        record = {'stage': name, 'seconds': 0.0, 'rows_in': rows_in, 'rows_out': 0,
+                  'bytes_read': 0, 'bytes_written': 0, 'conversion_errors': 0}
+        for hook in self._hooks:
+            hook('start', name, record)
+        return record
+
+    def _end(self, name, record):
+        record['peak_rss'] = self.peak_rss()
+        self.stages.append(record)
+        for hook in self._hooks:
+            hook('end', name, record)
+        return
+
+    @staticmethod
+    def peak_rss():
+        """Returns the peak resident set size of the process in bytes, or None if it is unknown"""
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    def to_dict(self):
+        return {'stages': self.stages, 'conversion_errors': self.conversion_errors, 'peak_rss': self.peak_rss()}
+
+    def write_json(self, pathname):
+        with open(pathname, 'w') as metrics_file:
+            json.dump(self.to_dict(), metrics_file, indent=2)
+        return
+
+
+class JobServer(socketserver.UnixStreamServer):
+    """
+    Resident server which runs jobs sent to a Unix domain socket, see etl_client.py.
+    A request is one line of JSON with the command line arguments of the job and the working
+    directory of the client, the answer is one line of JSON with the exit status, everything
+    the job has printed and its time. The jobs are run one at a time by run_job(argv)
+    in this process, so the imports, the worker pool and the cache stay warm between them
+    """
+
+    def __init__(self, socket_path, run_job):
+        self.socket_path = socket_path
+        self.run_job = run_job
+        if os.path.lexists(socket_path):
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                raise OSError('{} exists and is not a socket'.format(socket_path))
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(socket_path)
+                except ConnectionRefusedError:
+                    os.remove(socket_path)
+                else:
+                    raise OSError('a server is already running on {}'.format(socket_path))
+        super().__init__(socket_path, _JobHandler)
+        return
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        return
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        output = io.StringIO()
+        status = 0
+        start = time.perf_counter()
+        cwd = os.getcwd()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            try:
+                os.chdir(request['cwd'])
+                self.server.run_job(request['argv'])
+            except SystemExit as err:
+                status = err.code if isinstance(err.code, int) else int(err.code is not None)
+            except Exception:
+                traceback.print_exc()
+                status = 1
+            finally:
+                os.chdir(cwd)
+        response = {'status': status, 'output': output.getvalue(), 'seconds': time.perf_counter() - start}
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+        return
 
 
 if __name__ == "__main__":
 
-    def parser_cmd():
+    def parser_cmd(argv=None):
         """Parses command line arguments"""
 
         parser = argparse.ArgumentParser(prog='simple_etl',
                                          description='The program is a simple ETL with different file formats.')
         parser.add_argument('-i', '--in_files', nargs='*', type=argparse.FileType('r'),
-                            required=True, help='files with different formats')
+                            help='files with different formats')
         parser.add_argument('-ob', '--out_basic', type=argparse.FileType('w'),
-                            help='optional file path for recording results')
+                            help='optional file path for recording results, \'.etlc\' for a binary columnar file')
         parser.add_argument('-oa', '--out_advanced', type=argparse.FileType('w'),
-                            help='optional file path for recording results')
-        args = parser.parse_args()
+                            help='optional file path for recording results, \'.etlc\' for a binary columnar file')
+        parser.add_argument('--schema', action='store_true',
+                            help='print the keys of every file and the common keys without processing the data')
+        parser.add_argument('-s', '--stream', action='store_true',
+                            help='read the files row by row instead of loading them into memory')
+        parser.add_argument('-f', '--fused', action='store_true',
+                            help='like --stream, but both results are produced in a single pass over the files')
+        parser.add_argument('-p', '--pipeline', action='store_true',
+                            help='like --fused, but the files are parsed by --workers processes while the rows '
+                                 'are sorted and grouped, and the results are written in parallel')
+        parser.add_argument('-c', '--columnar', action='store_true',
+                            help='keep the data in columnar tables instead of lists of dictionaries')
+        parser.add_argument('-w', '--workers', type=int, default=1,
+                            help='number of processes parsing the files in parallel')
+        parser.add_argument('--cache', action='store_true',
+                            help='load unchanged files from the cache of parsed files and save the parsed ones to it')
+        parser.add_argument('--cache-dir', default=None,
+                            help='directory of the cache of parsed files, ~/.cache/simple_etl by default, '
+                                 'implies --cache')
+        parser.add_argument('--cache-size', type=int, default=CACHE_SIZE_LIMIT // (1024 * 1024),
+                            help='maximum size of the cache of parsed files, in megabytes')
+        parser.add_argument('--cache-hash', action='store_true',
+                            help='also compare the contents of the files with the cached ones')
+        parser.add_argument('--cache-stats', action='store_true',
+                            help='print the hits and misses of the cache of parsed files')
+        parser.add_argument('--sort-memory', type=int, default=SORT_MEMORY_LIMIT // (1024 * 1024),
+                            help='memory budget for sorting in the streaming modes, in megabytes')
+        parser.add_argument('--group-memory', type=int, default=AGGREGATION_MEMORY_LIMIT // (1024 * 1024),
+                            help='memory budget for grouping in the streaming modes, in megabytes')
+        parser.add_argument('--metrics', default=None,
+                            help='optional file path for recording the metrics of every stage as JSON')
+        parser.add_argument('--serve', default=None, metavar='SOCKET',
+                            help='run as a resident server for the jobs sent by etl_client.py to the Unix socket')
+        parser.add_argument('--cache-memory', type=int, default=64,
+                            help='with --serve, number of recently parsed files kept in memory')
+        parser.add_argument('--partial', default=None, metavar='PATH',
+                            help='only write the partial aggregate of the files, to be combined by --merge')
+        parser.add_argument('--merge', nargs='+', default=None, metavar='PARTIAL',
+                            help='combine the partial aggregates written by --partial into the advanced result')
+        args = parser.parse_args(argv)
+        if args.in_files is None and args.serve is None and args.merge is None:
+            parser.error('the following arguments are required: -i/--in_files')
+        args.cache = args.cache or args.cache_dir is not None
         return args
 
-    args_parse = parser_cmd()
-    file_names = [arg.name for arg in args_parse.in_files]
-    list_elements = ListElements(file_names)
-    list_elements.process_elements()
-
-    res_list_intersection = list_elements.list_intersection()
-    sorted_list_by_value = list_elements.sorted_list_of_dicts(res_list_intersection)
-    if args_parse.out_basic is not None:
-        Element.write_tsv(sorted_list_by_value, args_parse.out_basic.name)
-    else:
-        Element.write_tsv(sorted_list_by_value, 'result_basic.tsv')
+    def open_cache(args_parse, memory_entries=0):
+        """Returns the cache of parsed files, or None if its directory can not be created"""
+        try:
+            return ParseCache(args_parse.cache_dir, args_parse.cache_size * 1024 * 1024, args_parse.cache_hash,
+                              memory_entries)
+        except OSError as err:
+            print('\nError opening the cache:  {}, the files are parsed without it'.format(err))
+            return None
+
+    def write_result(list_of_dicts, pathname, metrics):
+        """Writes the result into the '.etlc' binary columnar file or into the '.tsv' file"""
+        if _file_type(pathname) == '.etlc':
+            Element.write_etlc(list_of_dicts, pathname, metrics)
+        else:
+            Element.write_tsv(list_of_dicts, pathname, metrics)
+        return
+
+    def run_job(args_parse, executor=None, parse_cache=None):
+        """Runs one job, the worker pool and the cache of a server can be given"""
+        in_files = list() if args_parse.in_files is None else args_parse.in_files
+        file_names = [arg.name for arg in in_files]
+        if executor is not None:
+            # the workers of the server keep its working directory, not the one of the client
+            file_names = [os.path.abspath(file_name) for file_name in file_names]
+        for arg in in_files + [args_parse.out_basic, args_parse.out_advanced]:
+            if arg is not None:
+                arg.close()
+        out_basic = 'result_basic.tsv' if args_parse.out_basic is None else args_parse.out_basic.name
+        out_advanced = 'result_advanced.tsv' if args_parse.out_advanced is None else args_parse.out_advanced.name
+        metrics = Metrics()
+        group_memory = args_parse.group_memory * 1024 * 1024
+
+        if args_parse.merge is not None:
+            try:
+                aggregator = HashAggregator.merge_partials(args_parse.merge, group_memory)
+            except (OSError, ValueError, EOFError) as err:
+                print('\nError merging partial aggregates:  {}'.format(err))
+                sys.exit(1)
+            write_result(metrics.iter_stage('merge_partials', aggregator), out_advanced, metrics)
+            if args_parse.metrics is not None:
+                metrics.write_json(args_parse.metrics)
+            return
+        list_elements = ListElements(file_names, metrics)
+        schema_report = list_elements.plan_schema()
+        if not args_parse.schema:
+            list_elements.print_schema_report(schema_report, mismatches_only=True)
+
+        try:
+            if args_parse.schema:
+                list_elements.print_schema_report(schema_report)
+                print('\ncommon keys:  {}'.format(', '.join(list_elements.inter_keys) or '-'))
+            elif args_parse.partial is not None:
+                list_elements.write_partial(args_parse.partial, group_memory)
+            elif args_parse.fused:
+                sort_memory = args_parse.sort_memory * 1024 * 1024
+                sorter, aggregator = list_elements.process_fused(sort_memory=sort_memory, group_memory=group_memory)
+                write_result(metrics.iter_stage('merge_sorted', sorter), out_basic, metrics)
+                write_result(metrics.iter_stage('merge_groups', aggregator), out_advanced, metrics)
+            elif args_parse.pipeline:
+                sort_memory = args_parse.sort_memory * 1024 * 1024
+                sorter, aggregator = list_elements.process_pipelined(workers=args_parse.workers,
+                                                                     sort_memory=sort_memory,
+                                                                     group_memory=group_memory)
+                with concurrent.futures.ThreadPoolExecutor(2) as writer_pool:
+                    writers = [writer_pool.submit(write_result, metrics.iter_stage('merge_sorted', sorter),
+                                                  out_basic, metrics),
+                               writer_pool.submit(write_result, metrics.iter_stage('merge_groups', aggregator),
+                                                  out_advanced, metrics)]
+                    for writer in writers:
+                        writer.result()
+            elif args_parse.stream:
+                sort_memory = args_parse.sort_memory * 1024 * 1024
+                sorted_rows = list_elements.iter_external_sorted(memory_limit=sort_memory)
+                write_result(metrics.iter_stage('iter_external_sorted', sorted_rows), out_basic, metrics)
+                convert_val = list_elements.iter_value_conversion(list_elements.iter_intersection())
+                convert_val = metrics.iter_stage('iter_value_conversion', convert_val)
+                processed_list = list_elements.iter_dictionary_comparison(convert_val, sorting_key='',
+                                                                          memory_limit=group_memory)
+                write_result(metrics.iter_stage('iter_dictionary_comparison', processed_list), out_advanced, metrics)
+            elif args_parse.columnar:
+                list_elements.process_tables(columns=list_elements.inter_keys)
+                table = list_elements.table_intersection()
+                with metrics.stage('sort_order', table.length) as record:
+                    order = table.sort_order()
+                    record['rows_out'] = len(order)
+                write_result(table.iter_rows(order), out_basic, metrics)
+                write_result(list_elements.table_dictionary_comparison(table), out_advanced, metrics)
+            else:
+                if parse_cache is None and args_parse.cache:
+                    parse_cache = open_cache(args_parse)
+                list_elements.process_elements(workers=args_parse.workers, columns=list_elements.inter_keys,
+                                               cache=parse_cache, executor=executor)
+                if parse_cache is not None and args_parse.cache_stats:
+                    statistics = parse_cache.statistics().items()
+                    print('\nCache:  {}'.format(', '.join('{} {}'.format(*item) for item in statistics)))
+                res_list_intersection = list_elements.list_intersection()
+                with metrics.stage('sorted_list_of_dicts', len(res_list_intersection)) as record:
+                    sorted_list_by_value = list_elements.sorted_list_of_dicts(res_list_intersection)
+                    record['rows_out'] = len(sorted_list_by_value)
+                write_result(sorted_list_by_value, out_basic, metrics)
 
-    convert_val = list_elements.value_conversion(sorted_list_by_value)
-    processed_list = list_elements.dictionary_comparison(convert_val)
-    if args_parse.out_basic is not None:
-        Element.write_tsv(processed_list, args_parse.out_advanced.name)
+                convert_val = list_elements.value_conversion(sorted_list_by_value)
+                processed_list = list_elements.dictionary_comparison(convert_val)
+                write_result(processed_list, out_advanced, metrics)
+        except (json.JSONDecodeError, ElementTree.ParseError):
+            # the streaming modes can not drop the rows of a malformed file like read_json and read_xml
+            for pathname in (out_basic, out_advanced, args_parse.partial):
+                if pathname is not None and os.path.exists(pathname):
+                    os.remove(pathname)
+            print('\nError:  a file can not be parsed, no results are written')
+            sys.exit(1)
+
+        if args_parse.metrics is not None:
+            metrics.write_json(args_parse.metrics)
+        return
+
+    def serve(args_parse):
+        """
+        Runs the resident server. The worker pool of --workers processes is started once,
+        with --cache the cache of parsed files is shared by the jobs with --cache, also in memory.
+        A job whose --cache-dir, --cache-size or --cache-hash differ from those of the server
+        uses its own cache
+        """
+        executor = concurrent.futures.ProcessPoolExecutor(max(1, args_parse.workers), initializer=signal.signal,
+                                                          initargs=(signal.SIGINT, signal.SIG_IGN))
+        list(executor.map(int, range(max(1, args_parse.workers))))
+        parse_cache = open_cache(args_parse, args_parse.cache_memory) if args_parse.cache else None
+
+        def cache_settings(cache_args):
+            cache_dir = ParseCache.default_dir() if cache_args.cache_dir is None else cache_args.cache_dir
+            return os.path.abspath(cache_dir), cache_args.cache_size, cache_args.cache_hash
+
+        server_settings = cache_settings(args_parse)
+
+        def run_server_job(argv):
+            job_args = parser_cmd(argv)
+            if job_args.serve is not None:
+                print('\nError:  a job can not start a server')
+                sys.exit(2)
+            job_cache = None
+            if job_args.cache and cache_settings(job_args) == server_settings:
+                job_cache = parse_cache
+            run_job(job_args, executor, job_cache)
+            return
+
+        server = JobServer(args_parse.serve, run_server_job)
+        print('\nServing jobs on {}'.format(args_parse.serve))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            executor.shutdown()
+        return
+
+    args_parse = parser_cmd()
+    if args_parse.serve is not None:
+        serve(args_parse)
     else:
-        Element.write_tsv(processed_list, 'result_advanced.tsv')
+        run_job(args_parse)
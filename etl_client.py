@@ -0,0 +1,28 @@
+"""
+Thin client of the resident server started with 'python etl.py --serve SOCKET'.
+Sends the arguments of a job to the server, waits for the job and prints its output:
+
+    python etl_client.py SOCKET -i examples/csv_data_1.csv examples/json_data.json -ob result_basic.tsv
+"""
+import json
+import os
+import socket
+import sys
+
+
+def submit(socket_path, argv):
+    """Sends the job to the server and returns its answer: the exit status, the output and the time"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps({'argv': list(argv), 'cwd': os.getcwd()}).encode() + b'\n')
+        with client.makefile('rb') as answer:
+            return json.loads(answer.readline())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print('usage: etl_client.py SOCKET [arguments of etl.py]')
+        sys.exit(2)
+    response = submit(sys.argv[1], sys.argv[2:])
+    sys.stdout.write(response['output'])
+    sys.exit(response['status'])
@@ -0,0 +1,135 @@
+import unittest
+import tempfile
+import os
+import etl
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestColumnarTable(unittest.TestCase):
+    """Testing all methods of the ColumnarTable class"""
+
+    def setUp(self):
+        self.list_of_dicts = [{'D1': 'b', 'D2': 'a', 'M1': '1'},
+                              {'D1': 'a', 'D2': 'b', 'M1': 'ex'},
+                              {'D1': 'b', 'D2': 'a', 'M1': 2}]
+        self.file_names = [os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_csv_data.csv'),
+                           os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_json_data.json'),
+                           os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_xml_data.xml')]
+        self.file_names_except = [os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_csv_data_except.csv'),
+                                  os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_json_data_except.json'),
+                                  os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_xml_data.xml')]
+        self.numpy = etl.numpy
+
+    def tearDown(self):
+        etl.numpy = self.numpy
+
+    def test_from_rows(self):
+        """
+        Testing from_rows to make sure that the columns are encoded
+        and the rows are restored with the original values
+        """
+        table = etl.ColumnarTable.from_rows(['D1', 'D2', 'M1'], self.list_of_dicts)
+        self.assertEqual(table.length, 3)
+        self.assertEqual(table.dictionary('D1'), ['b', 'a'])
+        self.assertEqual(list(table.column('D1')), [0, 1, 0])
+        self.assertEqual(list(table.column('M1')), [1, 0, 2])
+        self.assertEqual([number for number, err in table.conversion_errors('M1')], [1])
+        expected_list = [{'D1': 'b', 'D2': 'a', 'M1': 1},
+                         {'D1': 'a', 'D2': 'b', 'M1': 'ex'},
+                         {'D1': 'b', 'D2': 'a', 'M1': 2}]
+        self.assertEqual(list(table.iter_rows()), expected_list)
+
+    def test_to_file_and_from_file(self):
+        """
+        Testing to_file and from_file to make sure that the table is restored
+        from the plain and the compressed file, with all or only some columns
+        """
+        table = etl.ColumnarTable.from_rows(['D1', 'D2', 'M1'], self.list_of_dicts)
+        with tempfile.TemporaryDirectory() as tempdir:
+            for name in ('table.etlc', 'table.etlc.gz'):
+                path = os.path.join(tempdir, name)
+                table.to_file(path)
+                given_table = etl.ColumnarTable.from_file(path)
+                self.assertEqual(given_table.columns, ['D1', 'D2', 'M1'])
+                self.assertEqual(list(given_table.iter_rows()), list(table.iter_rows()))
+                self.assertEqual([number for number, err in given_table.conversion_errors('M1')], [1])
+                given_table = etl.ColumnarTable.from_file(path, ['M1', 'D1'])
+                self.assertEqual(list(given_table.iter_rows(given_table.sort_order())),
+                                 [{'M1': 'ex', 'D1': 'a'}, {'M1': 1, 'D1': 'b'}, {'M1': 2, 'D1': 'b'}])
+            path = os.path.join(tempdir, 'table.csv')
+            with open(path, 'w') as csv_file:
+                csv_file.write('D1,M1\n')
+            self.assertRaises(ValueError, lambda: etl.ColumnarTable.from_file(path))
+            path = os.path.join(tempdir, 'table.etlc')
+            with open(path, 'rb') as table_file:
+                data = table_file.read()
+            for size in (0, 10, 20, len(data) - 8):
+                with open(path, 'wb') as table_file:
+                    table_file.write(data[:size])
+                with self.assertRaisesRegex(ValueError, "is not a '.etlc' file"):
+                    etl.ColumnarTable.from_file(path)
+
+    def test_project_and_concatenate(self):
+        """
+        Testing project and concatenate to make sure that the codes
+        of the dictionary-encoded columns are re-encoded correctly
+        """
+        table = etl.ColumnarTable.from_rows(['D1', 'D2', 'M1'], self.list_of_dicts)
+        other = etl.ColumnarTable.from_rows(['D1', 'M1'], [{'D1': 'c', 'M1': '3'}, {'D1': 'a', 'M1': '4'}])
+        given_table = etl.ColumnarTable.concatenate([table.project(['D1', 'M1']), other], ['D1', 'M1'])
+        self.assertEqual(given_table.dictionary('D1'), ['b', 'a', 'c'])
+        self.assertEqual(list(given_table.column('D1')), [0, 1, 0, 2, 1])
+        self.assertEqual(list(given_table.iter_rows())[1], {'D1': 'a', 'M1': 'ex'})
+
+    def test_sort_order(self):
+        """
+        Testing sort_order to make sure that the order is the same
+        as the order of sorted_list_of_dicts
+        """
+        table = etl.ColumnarTable.from_rows(['D1', 'D2', 'M1'], self.list_of_dicts)
+        self.assertEqual(table.sort_order(), [1, 0, 2])
+        self.assertEqual(table.sort_order('D2'), [0, 2, 1])
+
+    def test_table_dictionary_comparison(self):
+        """
+        Testing ListElements.table_dictionary_comparison with and without NumPy
+        to make sure that the result is the same as in the list-based flow
+        """
+        for numpy in (self.numpy, None):
+            etl.numpy = numpy
+            for file_names in (self.file_names, self.file_names_except):
+                list_elements = etl.ListElements(file_names)
+                list_elements.process_elements()
+                sorted_list_by_value = list_elements.sorted_list_of_dicts(list_elements.list_intersection())
+                convert_val = list_elements.value_conversion(sorted_list_by_value)
+                expected_list = list_elements.dictionary_comparison(convert_val)
+
+                list_elements_tables = etl.ListElements(file_names)
+                list_elements_tables.process_tables()
+                table = list_elements_tables.table_intersection()
+                given_list = list_elements_tables.table_dictionary_comparison(table)
+                self.assertEqual(given_list, expected_list)
+
+    def test_table_dictionary_comparison_wide_values(self):
+        """
+        Testing ListElements.table_dictionary_comparison with values and sums that do not fit into int64
+        to make sure that they are summed exactly and not counted as conversion errors
+        """
+        list_of_dicts = [{'D1': 'a', 'M1': '9223372036854775807', 'M2': '1'},
+                         {'D1': 'a', 'M1': '5', 'M2': '2'},
+                         {'D1': 'b', 'M1': '99999999999999999999', 'M2': '3'},
+                         {'D1': 'b', 'M1': '7', 'M2': '4'}]
+        expected_list = [{'D1': 'a', 'MS1': 9223372036854775812, 'MS2': 3},
+                         {'D1': 'b', 'MS1': 100000000000000000006, 'MS2': 7}]
+        for numpy in (self.numpy, None):
+            etl.numpy = numpy
+            table = etl.ColumnarTable.from_rows(['D1', 'M1', 'M2'], list_of_dicts)
+            self.assertEqual(table.wide_values('M1'), {2: 99999999999999999999})
+            list_elements = etl.ListElements(list())
+            self.assertEqual(list_elements.table_dictionary_comparison(table), expected_list)
+            self.assertEqual(list_elements.metrics.conversion_errors, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
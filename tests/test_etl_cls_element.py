@@ -1,7 +1,11 @@
 import unittest
 import collections
 import tempfile
+import gzip
+import bz2
+import lzma
 import io
+import json
 import os
 import etl
 
@@ -16,8 +20,10 @@ class TestElement(unittest.TestCase):
         self.file_name_csv_empty = os.path.join(THIS_DIR, 'examples_cls_elem/test_csv_data_empty.csv')
         self.file_name_json = os.path.join(THIS_DIR, 'examples_cls_elem/test_json_data.json')
         self.file_name_json_empty = os.path.join(THIS_DIR, 'examples_cls_elem/test_json_data_empty.json')
+        self.file_name_json_broken = os.path.join(THIS_DIR, 'examples_cls_elem/test_json_data_broken.json')
         self.file_name_xml = os.path.join(THIS_DIR, 'examples_cls_elem/test_xml_data.xml')
         self.file_name_xml_empty = os.path.join(THIS_DIR, 'examples_cls_elem/test_xml_data_empty.xml')
+        self.file_name_xml_broken = os.path.join(THIS_DIR, 'examples_cls_elem/test_xml_data_broken.xml')
         self.expected_test_write_tsv = os.path.join(THIS_DIR, 'examples_cls_elem/expected_test_write_tsv.tsv')
 
     def test_read_csv(self):
@@ -64,6 +70,50 @@ class TestElement(unittest.TestCase):
         given_list = self.element.list_of_dicts
         self.assertEqual(given_list, list())
 
+    def test_read_json_streaming(self):
+        """
+        Testing read_json with a tiny read buffer to make sure that
+        the records are decoded correctly across the buffer boundaries
+        """
+        chunk_size = etl._JsonFieldsStream.chunk_size
+        etl._JsonFieldsStream.chunk_size = 3
+        try:
+            self.element = etl.Element(self.file_name_json)
+            self.element.read_json()
+        finally:
+            etl._JsonFieldsStream.chunk_size = chunk_size
+        expected_list = [{'D1': 'a', 'D2': 'a', 'M1': 0, 'M2': 0},
+                         {'D1': 'b', 'D2': 'b', 'M1': 1, 'M2': 1}]
+        self.assertEqual(self.element.list_of_dicts, expected_list)
+
+    def test_read_json_streaming_numbers(self):
+        """
+        Testing _JsonFieldsStream with every buffer size to make sure that
+        fractional and exponent numbers cut by the buffer boundaries are decoded whole
+        """
+        text = '{"version": 12.5, "fields": [{"D1": "a", "M1": 1, "M2": -0.5E+2}, 2.5e3, 7, ' \
+               '{"D1": true, "M1": 1.25e-3, "M2": null}], "size": 10.75}'
+        expected_list = json.loads(text)['fields']
+        chunk_size = etl._JsonFieldsStream.chunk_size
+        try:
+            for size in range(1, len(text) + 1):
+                etl._JsonFieldsStream.chunk_size = size
+                self.assertEqual(list(etl._JsonFieldsStream(io.StringIO(text))), expected_list)
+        finally:
+            etl._JsonFieldsStream.chunk_size = chunk_size
+
+    def test_read_json_broken(self):
+        """
+        Testing read_json and iter_json using a malformed JSON file:
+        read_json does not keep any rows, iter_json raises the error after the rows decoded before it
+        """
+        self.element = etl.Element(self.file_name_json_broken)
+        self.element.read_json()
+        self.assertEqual(self.element.list_of_dicts, list())
+        rows = self.element.iter_json()
+        self.assertEqual(next(rows), {'D1': 'a', 'M1': 0})
+        self.assertRaises(ValueError, lambda: list(rows))
+
     def test_read_xml(self):
         """
         Testing read_xml using a XML file
@@ -86,6 +136,42 @@ class TestElement(unittest.TestCase):
         given_list = self.element.list_of_dicts
         self.assertEqual(given_list, list())
 
+    def test_read_xml_broken(self):
+        """
+        Testing read_xml and iter_xml using a XML file with an error at the end:
+        read_xml does not keep any rows, iter_xml raises the error after the rows found before it
+        """
+        self.element = etl.Element(self.file_name_xml_broken)
+        self.element.read_xml()
+        self.assertEqual(self.element.list_of_dicts, list())
+        rows = self.element.iter_xml()
+        self.assertEqual(next(rows), {'D1': 'a', 'M1': '0'})
+        self.assertRaises(etl.ElementTree.ParseError, lambda: list(rows))
+
+    def test_read_schema(self):
+        """
+        Testing read_schema to make sure that the keys of every file type
+        are the same as keys_of_dicts gives after reading the whole file
+        """
+        for file_name in (self.file_name_csv, self.file_name_csv_empty, self.file_name_json,
+                          self.file_name_json_empty, self.file_name_xml, self.file_name_xml_empty):
+            given_keys = etl.Element(file_name).read_schema()
+            list_elements = etl.ListElements([file_name])
+            list_elements.process_elements()
+            self.assertEqual(given_keys, list(list_elements.elements[0].keys_of_dicts()))
+
+    def test_iter_rows_columns(self):
+        """
+        Testing iter_rows with the specified columns to make sure
+        that only these columns are read from every file type
+        """
+        for file_name in (self.file_name_csv, self.file_name_json, self.file_name_xml):
+            self.element = etl.Element(file_name)
+            expected_list = [{'M1': dct['M1'], 'D1': dct['D1']} for dct in self.element.iter_rows()]
+            given_list = list(self.element.iter_rows(['M1', 'D1']))
+            self.assertEqual(given_list, expected_list)
+            self.assertEqual(list(given_list[0].keys()), ['M1', 'D1'])
+
     def test_keys_of_dicts(self):
         """
         Testing keys_of_dicts to verify that keys
@@ -118,6 +204,81 @@ class TestElement(unittest.TestCase):
             with io.open(path) as given_file, io.open(self.expected_test_write_tsv) as expected_file:
                 self.assertListEqual(list(given_file), list(expected_file))
 
+    def test_iter_rows(self):
+        """
+        Testing iter_rows to make sure that every file type
+        is read row by row with the same result as the read_* methods
+        """
+        for file_name in (self.file_name_csv, self.file_name_json, self.file_name_xml):
+            self.element = etl.Element(file_name)
+            given_list = list(self.element.iter_rows())
+            self.element.list_of_dicts = list()
+            if file_name.endswith('.csv'):
+                self.element.read_csv()
+            elif file_name.endswith('.json'):
+                self.element.read_json()
+            else:
+                self.element.read_xml()
+            self.assertEqual(given_list, self.element.list_of_dicts)
+        self.assertRaises(NameError, lambda: etl.Element('test_data.tsv').iter_rows())
+
+    def test_write_tsv_iterator(self):
+        """
+        Testing write_tsv for the correctness
+        of writing a generator of dictionaries to a file
+        """
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'given_test_write_tsv.tsv')
+            etl.Element.write_tsv(({'D1': d, 'M1': m} for d, m in (('a', 0), ('b', 1))), path)
+            with io.open(path) as given_file, io.open(self.expected_test_write_tsv) as expected_file:
+                self.assertListEqual(list(given_file), list(expected_file))
+
+    def test_read_compressed(self):
+        """
+        Testing iter_rows and read_schema using '.gz', '.bz2' and '.xz' files
+        to make sure they are decompressed like the original files
+        """
+        with tempfile.TemporaryDirectory() as tempdir:
+            for file_name, codec, extension in ((self.file_name_csv, gzip, '.gz'),
+                                                (self.file_name_json, bz2, '.bz2'),
+                                                (self.file_name_xml, lzma, '.xz')):
+                path = os.path.join(tempdir, os.path.basename(file_name) + extension)
+                with open(file_name, 'rb') as in_file, codec.open(path, 'wb') as out_file:
+                    out_file.write(in_file.read())
+                element = etl.Element(path)
+                self.assertEqual(list(element.iter_rows()), list(etl.Element(file_name).iter_rows()))
+                self.assertEqual(element.read_schema(), etl.Element(file_name).read_schema())
+                self.assertIsNone(element.csv_chunks(1))
+
+    def test_write_tsv_compressed(self):
+        """
+        Testing write_tsv for the correctness
+        of writing a list of dictionaries to a '.gz' file
+        """
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'given_test_write_tsv.tsv.gz')
+            etl.Element.write_tsv([{'D1': 'a', 'M1': 0}, {'D1': 'b', 'M1': 1}], path)
+            with gzip.open(path, 'rt') as given_file, io.open(self.expected_test_write_tsv) as expected_file:
+                self.assertListEqual(list(given_file), list(expected_file))
+
+    def test_write_etlc(self):
+        """
+        Testing write_etlc and read_etlc to make sure that the rows
+        and the keys are restored from the binary columnar file
+        """
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'given_test_write_etlc.etlc')
+            etl.Element.write_etlc(etl.Element(self.file_name_csv).iter_rows(), path)
+            element = etl.Element(path)
+            element.read_etlc()
+            expected_list = [{'D1': 'a', 'D2': 'b', 'M1': 1, 'M2': 1},
+                             {'D1': 'b', 'D2': 'a', 'M1': 0, 'M2': 0}]
+            self.assertEqual(element.list_of_dicts, expected_list)
+            self.assertEqual(element.read_schema(), ['D1', 'D2', 'M1', 'M2'])
+            etl.Element.write_etlc([], path)
+            self.assertEqual(element.read_schema(), [])
+            self.assertEqual(list(element.iter_rows()), [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import etl
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestExternalSorter(unittest.TestCase):
+    """Testing all methods of the ExternalSorter class"""
+
+    def setUp(self):
+        self.list_of_dicts = [{'D1': 'c', 'D2': 'a', 'M1': '1'},
+                              {'D1': 'a', 'D2': 'b', 'M1': '1'},
+                              {'D1': 'b', 'D2': 'b', 'M1': '1'},
+                              {'D1': 'a', 'D2': 'c', 'M1': 2},
+                              {'D1': 'b', 'D2': 'a', 'M1': '0'}]
+        self.file_names = [os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_csv_data.csv'),
+                           os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_json_data.json'),
+                           os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_xml_data.xml')]
+
+    def test_sort_in_memory(self):
+        """
+        Testing the sorter when all the rows fit into memory
+        to make sure the result is the same as sorted_list_of_dicts
+        """
+        sorter = etl.ExternalSorter(self.list_of_dicts[0].keys())
+        sorter.extend(self.list_of_dicts)
+        expected_list = etl.ListElements.sorted_list_of_dicts(self.list_of_dicts)
+        self.assertEqual(list(sorter), expected_list)
+
+    def test_sort_with_spill(self):
+        """
+        Testing the sorter when every row is spilled into its own run,
+        to make sure the merge keeps the order of equal keys
+        """
+        sorter = etl.ExternalSorter(self.list_of_dicts[0].keys(), 'D2', memory_limit=0)
+        sorter.max_runs = 2
+        sorter.extend(self.list_of_dicts)
+        expected_list = etl.ListElements.sorted_list_of_dicts(self.list_of_dicts, 'D2')
+        self.assertEqual(list(sorter), expected_list)
+        self.assertIsNone(sorter._tempdir)
+
+    def test_is_sorted_and_add_run(self):
+        """
+        Testing is_sorted and add_run to make sure that sorted rows
+        are merged with the buffered rows correctly
+        """
+        sorter = etl.ExternalSorter(self.list_of_dicts[0].keys())
+        sorted_part = [self.list_of_dicts[1], self.list_of_dicts[2]]
+        self.assertTrue(sorter.is_sorted(sorted_part))
+        self.assertFalse(sorter.is_sorted(self.list_of_dicts))
+        sorter.add(self.list_of_dicts[0])
+        sorter.add_run(iter(sorted_part))
+        sorter.extend(self.list_of_dicts[3:])
+        expected_list = etl.ListElements.sorted_list_of_dicts(self.list_of_dicts)
+        self.assertEqual(list(sorter), expected_list)
+
+    def test_iter_external_sorted(self):
+        """
+        Testing iter_external_sorted to make sure that the files
+        are sorted in the same way as in the list-based flow
+        """
+        list_elements = etl.ListElements(self.file_names)
+        list_elements.process_elements()
+        expected_list = list_elements.sorted_list_of_dicts(list_elements.list_intersection())
+        for memory_limit in (0, etl.SORT_MEMORY_LIMIT):
+            list_elements_sorted = etl.ListElements(self.file_names)
+            read_files = list()
+            iter_projected = list_elements_sorted.iter_projected
+
+            def iter_projected_counted(file_name, columns):
+                read_files.append(file_name)
+                return iter_projected(file_name, columns)
+
+            list_elements_sorted.iter_projected = iter_projected_counted
+            given_list = list(list_elements_sorted.iter_external_sorted(memory_limit=memory_limit))
+            self.assertEqual(given_list, expected_list)
+            self.assertEqual(read_files, self.file_names)
+
+    def test_sorted_buffer(self):
+        """
+        Testing the sorter with rows added in sorted order to make sure that the order is detected
+        while they are added, and that a row out of order makes the buffer sorted before use
+        """
+        sorted_list = etl.ListElements.sorted_list_of_dicts(self.list_of_dicts)
+        sorter = etl.ExternalSorter(self.list_of_dicts[0].keys())
+        sorter.extend(sorted_list)
+        self.assertTrue(sorter._buffer_sorted)
+        sorter.add(self.list_of_dicts[0])
+        sorter.add(self.list_of_dicts[1])
+        self.assertFalse(sorter._buffer_sorted)
+        expected_list = etl.ListElements.sorted_list_of_dicts(sorted_list + self.list_of_dicts[:2])
+        self.assertEqual(list(sorter), expected_list)
+
+
+if __name__ == '__main__':
+    unittest.main()
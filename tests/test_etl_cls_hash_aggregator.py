@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+import etl
+
+
+class TestHashAggregator(unittest.TestCase):
+    """Testing all methods of the HashAggregator class"""
+
+    def setUp(self):
+        self.list_of_dicts = [{'D1': 'b', 'D2': 'a', 'M1': 1, 'M2': 0},
+                              {'D1': 'a', 'D2': 'b', 'M1': 2, 'M2': 1},
+                              {'D1': 'b', 'D2': 'a', 'M1': 3, 'M2': 1},
+                              {'D1': 'a', 'D2': 'a', 'M1': 4, 'M2': 1},
+                              {'D1': 'a', 'D2': 'b', 'M1': 5, 'M2': 1}]
+
+    def test_aggregation(self):
+        """
+        Testing the aggregator to make sure that the sums are correct
+        and the groups are in the order of their first appearance
+        """
+        aggregator = etl.HashAggregator(['D1', 'D2'], ['M1', 'M2'])
+        aggregator.extend(self.list_of_dicts)
+        expected_list = [{'D1': 'b', 'D2': 'a', 'MS1': 4, 'MS2': 1},
+                         {'D1': 'a', 'D2': 'b', 'MS1': 7, 'MS2': 2},
+                         {'D1': 'a', 'D2': 'a', 'MS1': 4, 'MS2': 1}]
+        self.assertEqual(list(aggregator), expected_list)
+
+    def test_aggregation_sorted(self):
+        """
+        Testing the aggregator with a sorting key to make sure that the groups
+        are in the same order as in dictionary_comparison of the sorted rows
+        """
+        list_elements = etl.ListElements(list())
+        list_elements.key_separation(['D1', 'D2', 'M1', 'M2'])
+        sorted_list = list_elements.sorted_list_of_dicts(self.list_of_dicts, 'D2')
+        expected_list = list_elements.dictionary_comparison(sorted_list)
+        aggregator = etl.HashAggregator(['D1', 'D2'], ['M1', 'M2'], sorting_key='D2')
+        aggregator.extend(self.list_of_dicts)
+        self.assertEqual(list(aggregator), expected_list)
+
+    def test_aggregation_with_spill(self):
+        """
+        Testing the aggregator with a memory limit that makes it spill every group,
+        to make sure that the result is the same as without spilling
+        """
+        for sorting_key in (None, ''):
+            aggregator = etl.HashAggregator(['D1', 'D2'], ['M1', 'M2'], sorting_key)
+            aggregator.extend(self.list_of_dicts)
+            expected_list = list(aggregator)
+            aggregator_spill = etl.HashAggregator(['D1', 'D2'], ['M1', 'M2'], sorting_key, memory_limit=0)
+            aggregator_spill.partitions = 2
+            aggregator_spill.extend(self.list_of_dicts)
+            self.assertEqual(list(aggregator_spill), expected_list)
+            self.assertIsNone(aggregator_spill._tempdir)
+
+    def test_partition_of(self):
+        """Testing partition_of to make sure the partition does not depend on anything but the key"""
+        self.assertEqual(etl.HashAggregator.partition_of(('a', 'b'), 16), 15)
+        self.assertEqual(etl.HashAggregator.partition_of(('a', 'b'), 16, 1),
+                         etl.HashAggregator.partition_of(('a', 'b'), 16, 1))
+
+    def write_partials(self, shards, memory_limit=etl.AGGREGATION_MEMORY_LIMIT):
+        pathnames = list()
+        for number, shard in enumerate(shards):
+            keys = sorted(shard[0].keys())
+            aggregator = etl.HashAggregator([key for key in keys if key.startswith('D')],
+                                            [key for key in keys if key.startswith('M')], '', memory_limit)
+            aggregator.extend(shard)
+            pathnames.append(os.path.join(self.tempdir.name, 'partial_{}'.format(number)))
+            aggregator.write_partial(pathnames[-1], keys)
+        return pathnames
+
+    def test_merge_partials(self):
+        """
+        Testing write_partial and merge_partials to make sure that the merged shards give
+        the same result as dictionary_comparison of all the sorted rows, with and without spilling
+        """
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        list_elements = etl.ListElements(list())
+        list_elements.key_separation(['D1', 'D2', 'M1', 'M2'])
+        expected_list = list_elements.dictionary_comparison(list_elements.sorted_list_of_dicts(self.list_of_dicts))
+        for memory_limit in (etl.AGGREGATION_MEMORY_LIMIT, 0):
+            pathnames = self.write_partials([self.list_of_dicts[:2], self.list_of_dicts[2:]], memory_limit)
+            partial = etl.PartialAggregate(pathnames[0])
+            self.assertEqual((partial.keys_with_d, partial.keys_with_m, partial.rows), (['D1', 'D2'], ['M1', 'M2'], 2))
+            aggregator = etl.HashAggregator.merge_partials(pathnames, memory_limit)
+            self.assertEqual(list(aggregator), expected_list)
+            self.assertIsNone(aggregator._tempdir)
+
+    def test_merge_partials_different_keys(self):
+        """Testing merge_partials to make sure that only the keys common to all partials are kept"""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        shard = [dict(dct, D3='c', M3=1) for dct in self.list_of_dicts[2:]]
+        pathnames = self.write_partials([self.list_of_dicts[:2], shard])
+        expected_list = [{'D1': 'a', 'D2': 'b', 'MS1': 7, 'MS2': 2},
+                         {'D1': 'a', 'D2': 'a', 'MS1': 4, 'MS2': 1},
+                         {'D1': 'b', 'D2': 'a', 'MS1': 4, 'MS2': 1}]
+        self.assertEqual(list(etl.HashAggregator.merge_partials(pathnames)), expected_list)
+        with open(pathnames[0], 'wb') as partial_file:
+            partial_file.write(b'D1\tD2\n')
+        with self.assertRaises(ValueError):
+            etl.HashAggregator.merge_partials(pathnames)
+
+
+if __name__ == '__main__':
+    unittest.main()
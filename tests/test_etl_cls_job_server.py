@@ -0,0 +1,135 @@
+import unittest
+import tempfile
+import threading
+import shutil
+import subprocess
+import time
+import os
+import sys
+import etl
+import etl_client
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestJobServer(unittest.TestCase):
+    """Testing the JobServer class with the client from etl_client.py"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tempdir.name, 'etl.sock')
+        self.jobs = list()
+        self.server = etl.JobServer(self.socket_path, self.run_job)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.tempdir.cleanup()
+
+    def run_job(self, argv):
+        self.jobs.append((argv, os.getcwd()))
+        if argv[0] == 'fail':
+            raise ValueError('broken job')
+        if argv[0] == 'exit':
+            print('usage', file=sys.stderr)
+            sys.exit(2)
+        print(' '.join(argv))
+        return
+
+    def test_submit(self):
+        """
+        Testing submit to make sure that the job is run in the working directory
+        of the client and that its output and exit status are returned
+        """
+        response = etl_client.submit(self.socket_path, ['-i', 'a.csv'])
+        self.assertEqual((response['status'], response['output']), (0, '-i a.csv\n'))
+        self.assertEqual(self.jobs, [(['-i', 'a.csv'], os.getcwd())])
+        response = etl_client.submit(self.socket_path, ['exit'])
+        self.assertEqual((response['status'], response['output']), (2, 'usage\n'))
+        response = etl_client.submit(self.socket_path, ['fail'])
+        self.assertEqual(response['status'], 1)
+        self.assertIn('ValueError: broken job', response['output'])
+
+    def test_socket_in_use(self):
+        """Testing the constructor to make sure that a running server is not replaced"""
+        self.assertRaises(OSError, lambda: etl.JobServer(self.socket_path, self.run_job))
+
+    def test_path_not_socket(self):
+        """Testing the constructor to make sure that a file at the socket path is not removed"""
+        file_name = os.path.join(self.tempdir.name, 'result_basic.tsv')
+        with open(file_name, 'w') as result_file:
+            result_file.write('D1\n')
+        self.assertRaises(OSError, lambda: etl.JobServer(file_name, self.run_job))
+        with open(file_name) as result_file:
+            self.assertEqual(result_file.read(), 'D1\n')
+
+
+class TestServeJobs(unittest.TestCase):
+    """Testing the jobs of a server started by 'etl.py --serve' with a pool of workers"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tempdir.name, 'etl.sock')
+        os.mkdir(os.path.join(self.tempdir.name, 'data'))
+        self.file_names = list()
+        for file_name in ('test_csv_data.csv', 'test_json_data.json', 'test_xml_data.xml'):
+            shutil.copy(os.path.join(THIS_DIR, 'examples_cls_lst_elem', file_name),
+                        os.path.join(self.tempdir.name, 'data'))
+            self.file_names.append(os.path.join('data', file_name))
+        env = dict(os.environ, XDG_CACHE_HOME=os.path.join(self.tempdir.name, 'cache'))
+        self.server = subprocess.Popen([sys.executable, os.path.join(THIS_DIR, '..', 'etl.py'),
+                                        '--serve', self.socket_path, '-w', '2', '--cache'],
+                                       cwd=THIS_DIR, env=env, stdout=subprocess.DEVNULL)
+        for _ in range(100):
+            if os.path.exists(self.socket_path):
+                break
+            time.sleep(0.1)
+
+    def tearDown(self):
+        self.server.terminate()
+        self.server.wait()
+        self.tempdir.cleanup()
+
+    def test_relative_paths(self):
+        """
+        Testing a job with relative paths parsed by the workers of the server,
+        which run in another working directory, to make sure that the files of the client are read
+        """
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(self.tempdir.name)
+        argv = ['-i'] + self.file_names + ['-ob', 'basic.tsv', '-oa', 'advanced.tsv', '-w', '2']
+        response = etl_client.submit(self.socket_path, argv)
+        self.assertEqual(response['status'], 0, response['output'])
+        list_elements = etl.ListElements(self.file_names)
+        list_elements.process_elements()
+        expected_list = list_elements.sorted_list_of_dicts(list_elements.list_intersection())
+        etl.Element.write_tsv(expected_list, 'expected.tsv')
+        with open('basic.tsv') as result_file, open('expected.tsv') as expected_file:
+            self.assertEqual(result_file.read(), expected_file.read())
+
+    def test_job_cache(self):
+        """
+        Testing the cache options of the jobs to make sure that the jobs with the settings of the server
+        share its cache and a job with its own --cache-dir uses that directory
+        """
+        argv = ['-i'] + [os.path.join(self.tempdir.name, file_name) for file_name in self.file_names]
+        argv += ['-ob', os.path.join(self.tempdir.name, 'basic.tsv'),
+                 '-oa', os.path.join(self.tempdir.name, 'advanced.tsv'), '--cache-stats']
+        response = etl_client.submit(self.socket_path, argv)
+        self.assertNotIn('Cache:', response['output'])
+        response = etl_client.submit(self.socket_path, argv + ['--cache'])
+        self.assertIn('hits 0, misses 3, stored 3', response['output'])
+        response = etl_client.submit(self.socket_path, argv + ['--cache'])
+        self.assertIn('hits 3, misses 3, stored 3', response['output'])
+        job_cache_dir = os.path.join(self.tempdir.name, 'job_cache')
+        response = etl_client.submit(self.socket_path, argv + ['--cache-dir', job_cache_dir])
+        self.assertIn('hits 0, misses 3, stored 3', response['output'])
+        self.assertEqual(len(os.listdir(job_cache_dir)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
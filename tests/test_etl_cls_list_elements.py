@@ -1,5 +1,8 @@
 import unittest
 import collections
+import contextlib
+import io
+import tempfile
 import os
 import etl
 
@@ -41,6 +44,66 @@ class TestListElements(unittest.TestCase):
         list_elements_with_tsv = etl.ListElements(file_names_with_tsv)
         self.assertRaises(NameError, lambda: list_elements_with_tsv.process_elements())
 
+    def test_process_elements_parallel(self):
+        """
+        Testing process_elements with several workers and a CSV file split into chunks
+        to make sure the rows are the same and in the same order as in the serial reading
+        """
+        with tempfile.TemporaryDirectory() as tempdir:
+            file_name_big_csv = os.path.join(tempdir, 'test_big_csv_data.csv')
+            with open(file_name_big_csv, 'w') as csv_file:
+                csv_file.write('D1,D2,M1\n')
+                for number in range(100):
+                    csv_file.write('{},b,{}\n'.format(number % 7, number))
+            file_names = self.file_names + [file_name_big_csv]
+            list_elements = etl.ListElements(file_names)
+            list_elements.process_elements()
+            list_elements_parallel = etl.ListElements(file_names)
+            list_elements_parallel.process_elements(workers=2, chunk_size=64)
+            self.assertEqual(len(list_elements_parallel.elements[3].list_of_dicts), 100)
+            for element, element_parallel in zip(list_elements.elements, list_elements_parallel.elements):
+                self.assertEqual(element.list_of_dicts, element_parallel.list_of_dicts)
+            self.assertGreater(len(list_elements.elements[3].csv_chunks(64)[1]), 1)
+
+        list_elements_with_tsv = etl.ListElements([self.file_name_csv, self.file_name_tsv])
+        self.assertRaises(NameError, lambda: list_elements_with_tsv.process_elements(workers=2))
+
+    def test_plan_schema(self):
+        """
+        Testing plan_schema to make sure that the common keys are found
+        and the missing and dropped keys of every file are reported
+        """
+        list_elements = etl.ListElements(self.file_names)
+        report = list_elements.plan_schema()
+        self.assertEqual(list_elements.inter_keys, ['D1', 'D2', 'M1'])
+        self.assertEqual(report[self.file_name_csv], {'keys': ['D1', 'D2', 'M1', 'M2'],
+                                                      'missing': list(),
+                                                      'dropped': ['M2']})
+        self.assertEqual(report[self.file_name_json], {'keys': ['D1', 'D2', 'M1'],
+                                                       'missing': ['M2'],
+                                                       'dropped': list()})
+        report[self.file_name_xml] = {'keys': ['D1', 'D2', 'M1'], 'missing': list(), 'dropped': list()}
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            list_elements.print_schema_report(report, mismatches_only=True)
+        self.assertIn(self.file_name_csv, output.getvalue())
+        self.assertIn('missing keys:  M2', output.getvalue())
+        self.assertNotIn(self.file_name_xml, output.getvalue())
+
+    def test_list_intersection_with_columns(self):
+        """
+        Testing list_intersection after reading only the columns
+        found by plan_schema to make sure the result is the same
+        """
+        list_elements = etl.ListElements(self.file_names)
+        list_elements.process_elements()
+        expected_list_intersection = list_elements.list_intersection()
+        list_elements_planned = etl.ListElements(self.file_names)
+        list_elements_planned.plan_schema()
+        list_elements_planned.process_elements(columns=list_elements_planned.inter_keys)
+        self.assertEqual(list(list_elements_planned.elements[0].keys_of_dicts()), ['D1', 'D2', 'M1'])
+        self.assertEqual(list_elements_planned.list_intersection(), expected_list_intersection)
+
     def test_list_intersection(self):
         """
         Testing list_intersection to make sure
@@ -148,6 +211,85 @@ class TestListElements(unittest.TestCase):
                                               {'D1': 'b', 'D2': 'b', 'MS1': 1}]
         self.assertEqual(given_transformed_list_of_dicts, expected_transformed_list_of_dicts)
 
+    def test_iter_intersection(self):
+        """
+        Testing iter_intersection to make sure that the streamed
+        rows are the same as the rows of list_intersection
+        """
+        list_elements = etl.ListElements(self.file_names)
+        list_elements.process_elements()
+        expected_list_intersection = list_elements.list_intersection()
+        given_list_intersection = list(etl.ListElements(self.file_names).iter_intersection())
+        self.assertEqual(given_list_intersection, expected_list_intersection)
+        self.assertEqual(list(given_list_intersection[0].keys()), ['D1', 'D2', 'M1'])
+
+    def test_iter_dictionary_comparison(self):
+        """
+        Testing iter_dictionary_comparison to make sure that unsorted rows
+        give the same groups in the same order as the sorted list of dictionaries
+        """
+        list_elements = etl.ListElements(self.file_names)
+        convert_val = list_elements.iter_value_conversion(list_elements.iter_intersection())
+        given_transformed_list_of_dicts = list(list_elements.iter_dictionary_comparison(convert_val, sorting_key=''))
+        expected_transformed_list_of_dicts = [{'D1': 'a', 'D2': 'b', 'MS1': 1},
+                                              {'D1': 'a', 'D2': 'a', 'MS1': 3},
+                                              {'D1': 'b', 'D2': 'a', 'MS1': 0},
+                                              {'D1': 'b', 'D2': 'b', 'MS1': 1}]
+        self.assertEqual(given_transformed_list_of_dicts, expected_transformed_list_of_dicts)
+
+    def test_process_fused(self):
+        """
+        Testing process_fused to make sure that both results of the single pass
+        are the same as the results of the list-based flow
+        """
+        for file_names in (self.file_names, [self.file_name_csv_except, self.file_name_json_except, self.file_name_xml]):
+            list_elements = etl.ListElements(file_names)
+            list_elements.process_elements()
+            expected_sorted_list = list_elements.sorted_list_of_dicts(list_elements.list_intersection())
+            convert_val = list_elements.value_conversion(expected_sorted_list)
+            expected_transformed_list = list_elements.dictionary_comparison(convert_val)
+            sorter, aggregator = etl.ListElements(file_names).process_fused(sort_memory=0, group_memory=0)
+            self.assertEqual(list(sorter), expected_sorted_list)
+            self.assertEqual(list(aggregator), expected_transformed_list)
+
+    def test_malformed_file(self):
+        """
+        Testing the streaming modes with a malformed JSON file to make sure that they fail
+        instead of keeping the rows decoded before the error
+        """
+        file_names = [self.file_name_csv, os.path.join(THIS_DIR, 'examples_cls_elem/test_json_data_broken.json')]
+        self.assertRaises(ValueError, lambda: etl.ListElements(file_names).process_fused())
+        self.assertRaises(ValueError, lambda: etl.ListElements(file_names).process_pipelined(workers=2))
+        self.assertRaises(ValueError, lambda: etl.ListElements(file_names).process_tables())
+
+    def test_process_pipelined(self):
+        """
+        Testing process_pipelined with '.csv' files split into parts and batches of one row
+        to make sure that both results are the same as the results of process_fused
+        """
+        for file_names in (self.file_names, [self.file_name_csv_except, self.file_name_json_except, self.file_name_xml]):
+            sorter, aggregator = etl.ListElements(file_names).process_fused()
+            expected_sorted_list, expected_transformed_list = list(sorter), list(aggregator)
+            list_elements = etl.ListElements(file_names)
+            sorter, aggregator = list_elements.process_pipelined(workers=2, chunk_size=1, batch_size=1, queue_size=1)
+            self.assertEqual(list(sorter), expected_sorted_list)
+            self.assertEqual(list(aggregator), expected_transformed_list)
+        self.assertEqual(list_elements.metrics.conversion_errors, 2)
+
+    def test_write_partial(self):
+        """
+        Testing write_partial with every file in its own partial aggregate
+        to make sure that the merged partials give the advanced result of process_fused
+        """
+        sorter, aggregator = etl.ListElements(self.file_names).process_fused()
+        expected_transformed_list = list(aggregator)
+        with tempfile.TemporaryDirectory() as tempdir:
+            pathnames = list()
+            for number, file_name in enumerate(self.file_names):
+                pathnames.append(os.path.join(tempdir, 'partial_{}'.format(number)))
+                etl.ListElements([file_name]).write_partial(pathnames[-1])
+            self.assertEqual(list(etl.HashAggregator.merge_partials(pathnames)), expected_transformed_list)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import tempfile
+import json
+import os
+import etl
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestMetrics(unittest.TestCase):
+    """Testing all methods of the Metrics class"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.file_names = [os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_csv_data.csv'),
+                           os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_json_data.json'),
+                           os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_xml_data.xml')]
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_stage_and_hooks(self):
+        """Testing stage and iter_stage to make sure that the records are filled and the hooks are called"""
+        metrics = etl.Metrics()
+        events = list()
+        metrics.add_hook(lambda event, name, record: events.append((event, name)))
+        with metrics.stage('first', 3) as record:
+            record['rows_out'] = 2
+        self.assertEqual(list(metrics.iter_stage('second', iter([{'a': 1}, {'a': 2}]))), [{'a': 1}, {'a': 2}])
+        self.assertEqual(events, [('start', 'first'), ('end', 'first'), ('start', 'second'), ('end', 'second')])
+        self.assertEqual([(record['stage'], record['rows_in'], record['rows_out']) for record in metrics.stages],
+                         [('first', 3, 2), ('second', 0, 2)])
+        self.assertTrue(all(record['seconds'] >= 0 for record in metrics.stages))
+
+    def test_pipeline_metrics(self):
+        """
+        Testing the metrics of the list processing to make sure that every stage is recorded
+        and the conversion errors are counted
+        """
+        metrics = etl.Metrics()
+        list_elements = etl.ListElements(self.file_names, metrics)
+        list_elements.process_elements()
+        res_list_intersection = list_elements.list_intersection()
+        convert_val = list_elements.value_conversion([{'D1': 'a', 'M1': 'x'}, {'D1': 'b', 'M1': 'y'}])
+        self.assertEqual(convert_val, [{'D1': 'a', 'M1': 0}, {'D1': 'b', 'M1': 0}])
+        pathname = os.path.join(self.tempdir.name, 'result.tsv')
+        etl.Element.write_tsv(res_list_intersection, pathname, metrics)
+        stages = {record['stage']: record for record in metrics.stages}
+        self.assertEqual(stages['process_elements']['rows_out'], 5)
+        self.assertEqual(stages['process_elements']['bytes_read'],
+                         sum(os.path.getsize(file_name) for file_name in self.file_names))
+        self.assertEqual(stages['value_conversion']['conversion_errors'], 2)
+        self.assertEqual(stages['write_tsv']['rows_out'], len(res_list_intersection))
+        self.assertEqual(stages['write_tsv']['bytes_written'], os.path.getsize(pathname))
+        self.assertEqual(metrics.conversion_errors, 2)
+
+        metrics_path = os.path.join(self.tempdir.name, 'metrics.json')
+        metrics.write_json(metrics_path)
+        with open(metrics_path) as metrics_file:
+            self.assertEqual(json.load(metrics_file)['conversion_errors'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import tempfile
+import shutil
+import os
+import etl
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestParseCache(unittest.TestCase):
+    """Testing all methods of the ParseCache class"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tempdir.name, 'cache')
+        self.file_name_csv = os.path.join(self.tempdir.name, 'test_csv_data.csv')
+        shutil.copy(os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_csv_data.csv'), self.file_name_csv)
+        self.file_names = [self.file_name_csv,
+                           os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_json_data.json'),
+                           os.path.join(THIS_DIR, 'examples_cls_lst_elem/test_xml_data.xml')]
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_store_and_load(self):
+        """
+        Testing store and load to make sure that the rows are restored
+        and the entry depends on the columns and on the file itself
+        """
+        cache = etl.ParseCache(self.cache_dir)
+        list_of_dicts = [{'D1': 'a', 'M1': 1}, {'D1': 'b', 'M2': '2'}]
+        self.assertIsNone(cache.load(self.file_name_csv))
+        cache.store(self.file_name_csv, list_of_dicts)
+        self.assertEqual(cache.load(self.file_name_csv), list_of_dicts)
+        self.assertIsNone(cache.load(self.file_name_csv, ['D1']))
+        with open(self.file_name_csv, 'a') as csv_file:
+            csv_file.write('c,c,2,2\n')
+        self.assertIsNone(cache.load(self.file_name_csv))
+        self.assertEqual(cache.statistics(), {'hits': 1, 'misses': 3, 'stored': 1, 'evicted': 0})
+
+    def test_hash_content(self):
+        """Testing the content hash to make sure that a file changed in place is not loaded from the cache"""
+        cache = etl.ParseCache(self.cache_dir, hash_content=True)
+        cache.store(self.file_name_csv, [{'D1': 'a'}])
+        stat = os.stat(self.file_name_csv)
+        with open(self.file_name_csv, 'r+') as csv_file:
+            csv_file.write('X')
+        os.utime(self.file_name_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertIsNone(cache.load(self.file_name_csv))
+
+    def test_evict(self):
+        """Testing evict to make sure that the least recently used entries are removed"""
+        cache = etl.ParseCache(self.cache_dir, max_size=0)
+        cache.store(self.file_name_csv, [{'D1': 'a'}])
+        self.assertEqual(os.listdir(self.cache_dir), list())
+        self.assertEqual(cache.evicted, 1)
+
+    def test_process_elements_with_cache(self):
+        """
+        Testing process_elements with the cache to make sure that the second
+        reading loads all files from the cache with the same result
+        """
+        cache = etl.ParseCache(self.cache_dir)
+        list_elements = etl.ListElements(self.file_names)
+        list_elements.process_elements(cache=cache)
+        list_elements_cached = etl.ListElements(self.file_names)
+        list_elements_cached.process_elements(cache=cache)
+        self.assertEqual(cache.statistics()['hits'], 3)
+        self.assertEqual(list_elements_cached.list_intersection(), list_elements.list_intersection())
+
+    def test_memory_entries(self):
+        """
+        Testing the entries kept in memory to make sure that only the most recent ones
+        are kept and an entry removed from the disk is not returned
+        """
+        cache = etl.ParseCache(self.cache_dir, memory_entries=1)
+        cache.store(self.file_name_csv, [{'D1': 'a'}])
+        cache.store(self.file_name_csv, [{'D1': 'b'}], ['D1'])
+        self.assertEqual(list(cache._memory.values()), [[{'D1': 'b'}]])
+        self.assertEqual(cache.load(self.file_name_csv), [{'D1': 'a'}])
+        os.remove(cache.entry_name(self.file_name_csv))
+        self.assertIsNone(cache.load(self.file_name_csv))
+
+    def test_store_error(self):
+        """Testing store to make sure that a cache which can not be written does not stop the processing"""
+        cache = etl.ParseCache(self.cache_dir)
+        shutil.rmtree(self.cache_dir)
+        cache.store(self.file_name_csv, [{'D1': 'a'}])
+        self.assertEqual(cache.stored, 0)
+        list_elements = etl.ListElements(self.file_names)
+        list_elements.process_elements()
+        list_elements_cached = etl.ListElements(self.file_names)
+        list_elements_cached.process_elements(cache=cache)
+        self.assertEqual(list_elements_cached.list_intersection(), list_elements.list_intersection())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import etl
+
+
+class TestRowCompiler(unittest.TestCase):
+    """Testing all methods of the RowCompiler class"""
+
+    def test_projector_and_tuple_getter(self):
+        """Testing projector and tuple_getter to make sure that the keys are taken in their order"""
+        dct = {'M1': '1', 'D2': 'b', 'D1': 'a'}
+        self.assertEqual(list(etl.RowCompiler.projector(['D1', 'M1'])(dct).items()), [('D1', 'a'), ('M1', '1')])
+        self.assertEqual(etl.RowCompiler.tuple_getter(['D1', 'D2'])(dct), ('a', 'b'))
+        self.assertEqual(etl.RowCompiler.tuple_getter(['D1'])(dct), ('a',))
+        self.assertEqual(etl.RowCompiler.tuple_getter([])(dct), ())
+        self.assertRaises(KeyError, lambda: etl.RowCompiler.projector(['D3'])(dct))
+
+    def test_key_sorter(self):
+        """
+        Testing key_sorter to make sure that the keys are sorted
+        also in the dictionaries with other keys
+        """
+        sort_keys = etl.RowCompiler.key_sorter(['M1', 'D1'])
+        self.assertEqual(list(sort_keys({'M1': '1', 'D1': 'a'})), ['D1', 'M1'])
+        self.assertEqual(list(sort_keys({'M1': '1', 'D2': 'a'})), ['D2', 'M1'])
+        self.assertEqual(list(sort_keys({'M1': '1', 'D2': 'a', 'D1': 'b'})), ['D1', 'D2', 'M1'])
+
+    def test_converter(self):
+        """
+        Testing converter to make sure that the values are converted like by _convert_row,
+        the errors are counted and other layouts are passed to the fallback
+        """
+        errors = list()
+
+        def error(err):
+            errors.append(str(err))
+            return 0
+
+        convert = etl.RowCompiler.converter(['D1', "M'1", 'M2'], ["M'1", 'M2'], error, lambda dct: 'fallback')
+        self.assertEqual(convert({'D1': '5', "M'1": '1', 'M2': 2}), {'D1': '5', "M'1": 1, 'M2': 2})
+        self.assertEqual(convert({'D1': 'a', "M'1": 'ex', 'M2': '3'}), {'D1': 'a', "M'1": 0, 'M2': 3})
+        self.assertEqual(errors, ["invalid literal for int() with base 10: 'ex'"])
+        self.assertEqual(convert({'D1': 'a', "M'1": '1'}), 'fallback')
+        self.assertEqual(convert({'D1': 'a', "M'1": '1', 'M3': '1'}), 'fallback')
+
+
+if __name__ == '__main__':
+    unittest.main()